@@ -0,0 +1,166 @@
+"""Benchmarks for command resolution, help rendering and dispatch.
+
+Run it from the repository root:
+
+    python benchmarks/bench.py --output results.json
+
+Results are saved as JSON to compare runs over time.
+"""
+
+# built-in
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import string
+import sys
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+# project
+from dephell_argparse import Command, CommandHandler, Parser, __version__  # noqa: E402
+
+
+SIZES = (10, 1000, 50000)
+
+
+class BenchCommand(CommandHandler):
+    """Do nothing, quickly
+    """
+    def __call__(self):
+        return 0
+
+
+def make_names(size: int, seed: int = 42) -> List[str]:
+    """Generate unique names, a half of them of one word and a half of two words.
+    """
+    rnd = random.Random(seed)
+
+    def word() -> str:
+        return ''.join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 10)))
+
+    groups = [word() for _ in range(max(size // 20, 1))]
+    names = set()  # type: set
+    while len(names) < size:
+        if len(names) % 2:
+            names.add(rnd.choice(groups) + ' ' + word())
+        else:
+            names.add(word())
+    return sorted(names)
+
+
+def make_parser(names: List[str]) -> Parser:
+    parser = Parser(prog='bench', stream=io.StringIO())
+    for name in names:
+        parser.add_command(BenchCommand, name=name)
+    return parser
+
+
+def make_typo(name: str) -> str:
+    return name[:-2] + name[-1] + name[-2]
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(
+        number=number,
+        best_us=min(timings) * 1e6,
+        mean_us=sum(timings) / len(timings) * 1e6,
+        peak_kib=peak / 1024,
+    )
+
+
+def bench_threads(parser: Parser, argv: List[str], threads: int = 8, calls: int = 100) -> None:
+    """Call `handle` from many threads at once, `threads * calls` times in total.
+    """
+    def worker(_) -> None:
+        for _ in range(calls):
+            parser.handle(argv, stdout=io.StringIO())
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+
+
+def bench_registry(size: int) -> List[Dict[str, Any]]:
+    names = make_names(size)
+    one_word = next(name for name in names if ' ' not in name)
+    two_words = next(name for name in names if ' ' in name)
+
+    tracemalloc.start()
+    parser = make_parser(names)
+    _, registry_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    index = parser._index
+    devnull = open(os.devnull, 'w')
+    cases = dict(
+        exact_one_word=lambda: Command(argv=[one_word], index=index).match,
+        exact_two_words=lambda: Command(argv=two_words.split(), index=index).match,
+        single_word_hit=lambda: Command(argv=[two_words.split()[1]], index=index).match,
+        typo=lambda: Command(argv=[make_typo(one_word)], index=index).match,
+        miss=lambda: Command(argv=['zzzzzzzzzzzz'], index=index).match,
+        miss_guesses=lambda: Command(argv=['zzzzzzzzzzzz'], index=index).guesses,
+        format_help=parser.format_help,
+        # help isn't cached here to see the cost of rendering
+        render_help=parser._render_help,
+        stream_help=lambda: parser.write_help(stream=devnull),
+        handle=lambda: parser.handle(two_words.split()),
+        # the same amount of calls from one thread and from many ones
+        handle_thread=lambda: bench_threads(parser, two_words.split(), threads=1, calls=800),
+        handle_threads=lambda: bench_threads(parser, two_words.split(), threads=8, calls=100),
+    )
+
+    results = []
+    for case, func in cases.items():
+        result = measure(func)
+        result.update(registry=size, case=case, registry_peak_kib=registry_peak / 1024)
+        results.append(result)
+        print('{registry:>6} {case:<16} {best_us:>12.2f} us {peak_kib:>10.1f} KiB'.format(**result))
+    devnull.close()
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    cli = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    cli.add_argument('--output', default='bench_results.json', help='path to save JSON results')
+    cli.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='registry sizes')
+    args = cli.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        results.extend(bench_registry(size))
+
+    report = dict(
+        meta=dict(
+            timestamp=time.time(),
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            platform=platform.platform(),
+            version=__version__,
+        ),
+        results=results,
+    )
+    with open(args.output, 'w', encoding='utf8') as stream:
+        json.dump(report, stream, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
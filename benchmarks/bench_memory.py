@@ -0,0 +1,91 @@
+"""Memory used by the registry, in bytes per registered command.
+
+Compares handler instances (every command is a full `CommandHandler`)
+and compact records (commands registered as classes or import paths).
+Run it from the repository root:
+
+    python benchmarks/bench_memory.py --size 50000
+"""
+
+# built-in
+import argparse
+import gc
+import io
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+# project
+from dephell_argparse import Parser  # noqa: E402
+
+
+sys.path.insert(0, str(Path(__file__).absolute().parent))
+
+# external
+from bench import BenchCommand, make_names  # noqa: E402, I100
+
+
+def register_instances(parser: Parser, names: List[str]) -> None:
+    for name in names:
+        parser.add_command(BenchCommand(name=name))
+
+
+def register_classes(parser: Parser, names: List[str]) -> None:
+    for name in names:
+        parser.add_command(BenchCommand, name=name)
+
+
+def register_paths(parser: Parser, names: List[str]) -> None:
+    for name in names:
+        parser.add_command('bench:BenchCommand', name=name, summary='Do nothing, quickly')
+
+
+def measure(register: Callable[[Parser, List[str]], None], names: List[str],
+            with_help: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    parser = Parser(prog='bench', stream=io.StringIO())
+    register(parser, names)
+    if with_help:
+        # materializes names, descriptions and summaries
+        parser.format_help()
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del parser
+    return (after - before) / len(names)
+
+
+def main(argv: List[str] = None) -> int:
+    cli = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    cli.add_argument('--size', type=int, default=50000, help='registry size')
+    cli.add_argument('--output', help='path to save JSON results')
+    args = cli.parse_args(argv)
+
+    names = make_names(args.size)
+    results = []  # type: List[Dict]
+    for register in (register_instances, register_classes, register_paths):
+        for with_help in (False, True):
+            result = dict(
+                registry=args.size,
+                case=register.__name__,
+                with_help=with_help,
+                bytes_per_command=measure(register, names, with_help=with_help),
+            )
+            results.append(result)
+            print('{case:<20} help={with_help!s:<6} {bytes_per_command:>10.1f} B'.format(**result))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as stream:
+            json.dump(results, stream, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
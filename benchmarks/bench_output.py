@@ -0,0 +1,85 @@
+"""Output throughput of command handlers, in rows per second.
+
+Compares `CommandHandler.print` for every row and `write_lines`
+with a few buffer sizes. Rows are written into a file,
+so the bytes path of `write_lines` is measured as well.
+Run it from the repository root:
+
+    python benchmarks/bench_output.py --rows 1000000
+"""
+
+# built-in
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+# project
+from dephell_argparse import CommandHandler  # noqa: E402
+
+
+BUFFER_SIZES = (4 * 1024, 64 * 1024, 1024 * 1024)
+
+
+def make_rows(count: int) -> Iterator[str]:
+    for index in range(count):
+        yield 'row {}\tsome value\t{}'.format(index, index * 2)
+
+
+def write_print(handler: CommandHandler, count: int) -> None:
+    for row in make_rows(count):
+        handler.print(row)
+
+
+def write_lines(handler: CommandHandler, count: int) -> None:
+    handler.write_lines(make_rows(count))
+    handler.flush()
+
+
+def measure(write: Callable[[CommandHandler, int], None], count: int, **kwargs) -> float:
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'rows.txt')
+        with open(path, 'w', encoding='utf8') as stream:
+            handler = CommandHandler(stream=stream, **kwargs)
+            start = time.perf_counter()
+            write(handler, count)
+            stream.flush()
+            elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def main(argv: List[str] = None) -> int:
+    cli = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    cli.add_argument('--rows', type=int, default=1000000, help='rows to write')
+    cli.add_argument('--output', help='path to save JSON results')
+    args = cli.parse_args(argv)
+
+    results = []  # type: List[Dict]
+    cases = [('print', write_print, None)]
+    cases.extend(('write_lines', write_lines, size) for size in BUFFER_SIZES)
+    for case, write, size in cases:
+        kwargs = {} if size is None else dict(buffer_size=size)
+        result = dict(
+            rows=args.rows,
+            case=case,
+            buffer_size=size,
+            rows_per_sec=measure(write, args.rows, **kwargs),
+        )
+        results.append(result)
+        print('{case:<12} buffer={buffer_size!s:<8} {rows_per_sec:>14,.0f} rows/sec'.format(**result))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as stream:
+            json.dump(results, stream, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
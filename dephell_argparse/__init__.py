@@ -4,7 +4,9 @@
 # app
 from ._command import Command
 from ._handler import CommandHandler
+from ._metrics import Metrics
 from ._parser import Parser
+from ._profile import JSONReporter, Profile, TextReporter
 
 
 __version__ = '0.1.3'
@@ -12,5 +14,9 @@ __version__ = '0.1.3'
 __all__ = [
     'Command',
     'CommandHandler',
+    'JSONReporter',
+    'Metrics',
     'Parser',
+    'Profile',
+    'TextReporter',
 ]
@@ -0,0 +1,24 @@
+# built-in
+from typing import Any
+
+
+def is_awaitable(value: Any) -> bool:
+    # asyncio and inspect aren't imported until any handler is async
+    return hasattr(value, '__await__')
+
+
+def run_awaitable(awaitable: Any) -> Any:
+    """Run awaitable returned by async handler in a new event loop.
+    """
+    import asyncio
+
+    async def wrapper():
+        return await awaitable
+
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(wrapper())
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(wrapper())
+    finally:
+        loop.close()
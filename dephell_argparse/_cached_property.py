@@ -1,3 +1,6 @@
+# built-in
+from threading import RLock
+from typing import Dict, Tuple
 
 
 # https://github.com/bottlepy/bottle/commit/fa7733e075da0d790d809aa3d2f53071897e6f76
@@ -6,14 +9,45 @@ class cached_property(object):  # noqa: N801
     """
     A property that is only computed once per instance and then replaces itself
     with an ordinary attribute. Deleting the attribute resets the property.
+    The value is computed under the lock of the instance, so it's computed once
+    even in threads, and different instances are computed in parallel.
     """
 
     def __init__(self, func):
         self.__doc__ = func.__doc__
         self.func = func
+        # guards `locks` only, never held while the value is computed
+        self.lock = RLock()
+        # locks of instances by `id`, and how many threads use every lock
+        self.locks = dict()  # type: Dict[int, Tuple[RLock, int]]
 
     def __get__(self, obj, cls):
         if obj is None:
             return self
-        value = obj.__dict__[self.func.__name__] = self.func(obj)
+        key = id(obj)
+        with self.lock:
+            lock, users = self.locks.get(key, (None, 0))
+            if lock is None:
+                lock = RLock()
+            self.locks[key] = (lock, users + 1)
+        try:
+            return self._compute(obj, lock)
+        finally:
+            with self.lock:
+                lock, users = self.locks[key]
+                if users == 1:
+                    # the instance is alive, so its id isn't reused until here
+                    del self.locks[key]
+                else:
+                    self.locks[key] = (lock, users - 1)
+
+    def _compute(self, obj, lock: RLock):
+        name = self.func.__name__
+        with lock:
+            # another thread could compute it while we were waiting for the lock
+            try:
+                return obj.__dict__[name]
+            except KeyError:
+                pass
+            value = obj.__dict__[name] = self.func(obj)
         return value
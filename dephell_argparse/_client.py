@@ -0,0 +1,77 @@
+"""Tiny client for `Parser.serve`. It uses only stdlib to start fast.
+
+    python -m dephell_argparse._client /path/to/socket [ARGS...]
+
+Socket, json and array are imported only when the server is called,
+so importing the package for `Parser` doesn't pay for them.
+The package doesn't import this module, so it can be run with `-m`.
+"""
+
+# built-in
+import os
+import struct
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Sequence
+
+
+if TYPE_CHECKING:
+    # built-in
+    import socket
+
+
+# length of the request header or the exit code
+INT = struct.Struct('!i')
+
+
+def send_request(conn: 'socket.socket', request: Dict[str, Any], fds: Sequence[int]) -> None:
+    import array
+    import json
+    import socket
+
+    payload = json.dumps(request).encode('utf8')
+    # fds are sent with the first bytes of the message
+    conn.sendmsg(
+        [INT.pack(len(payload))],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))],
+    )
+    conn.sendall(payload)
+
+
+def call_server(path: str, argv: Sequence[str] = None) -> int:
+    """Run the command in the warm server and return its exit code.
+
+    The server gets the client's argv, cwd, env, stdin, stdout and stderr.
+    """
+    import socket
+
+    if argv is None:
+        argv = sys.argv[1:]
+    sys.stdout.flush()
+    sys.stderr.flush()
+    request = dict(argv=list(argv), cwd=os.getcwd(), env=dict(os.environ))
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+        send_request(conn, request=request, fds=(0, 1, 2))
+        response = b''
+        while len(response) < INT.size:
+            chunk = conn.recv(INT.size - len(response))
+            if not chunk:
+                # the command process has crashed
+                return 1
+            response += chunk
+    finally:
+        conn.close()
+    code, = INT.unpack(response)
+    return code
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+    return call_server(path=sys.argv[1], argv=sys.argv[2:])
+
+
+if __name__ == '__main__':
+    exit(main())
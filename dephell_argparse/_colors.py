@@ -2,16 +2,6 @@
 import os
 
 
-try:
-    try:
-        from colorama import Fore, init
-    except ImportError:
-        from pip._vendor.colorama import Fore, init
-    init()
-except ImportError:
-    Fore = None
-
-
 class _ForeAnsi:
     _f = '\x1b[{}m'.format
 
@@ -40,8 +30,29 @@ class _ForeWin:
     RESET = _f(39)
 
 
-if Fore is None:
-    if os.name == 'nt':
-        Fore = _ForeAnsi
-    else:
-        Fore = _ForeWin
+_fore = None
+
+
+def get_fore():
+    """Get colors, resolved on the first call.
+
+    Colorama is used if it is installed. It isn't imported on the package import
+    because `init` wraps stdout and stderr, and that is needed only
+    when something colored is going to be printed.
+    """
+    global _fore
+    if _fore is not None:
+        return _fore
+
+    try:
+        from colorama import Fore, init
+    except ImportError:
+        if os.name == 'nt':
+            _fore = _ForeAnsi
+        else:
+            _fore = _ForeWin
+        return _fore
+
+    init()
+    _fore = Fore
+    return _fore
@@ -1,28 +1,36 @@
 # built-in
-from collections import Counter, defaultdict
-from typing import DefaultDict, FrozenSet, Iterable, List, Optional, Tuple
+from collections import Counter
+from typing import FrozenSet, Iterable, List, Optional, Tuple
 
 # app
 from ._cached_property import cached_property
+from ._index import CommandsIndex
 
 
 class Command:
-    def __init__(self, argv: Iterable[str], commands: Iterable[str]):
+    # how many guesses by typos to show
+    max_guesses = 20
+
+    def __init__(self, argv: Iterable[str], commands: Iterable[str] = (),
+                 index: CommandsIndex = None):
         self._argv = tuple(argv)
-        self.commands = {c.lower() for c in commands}
+        if index is None:
+            index = CommandsIndex(commands)
+        self.index = index
+
+    @property
+    def commands(self) -> Iterable[str]:
+        return self.index
 
     @cached_property
     def groups(self) -> FrozenSet[str]:
-        groups = set()
-        for command in self.commands:
-            group, _, _ = command.rpartition(' ')
-            if group:
-                groups.add(group)
-        return frozenset(groups)
+        return frozenset(self.index.groups)
 
     @cached_property
     def words(self) -> int:
-        return len((self.match or '').split())
+        """How many words of argv are the command name.
+        """
+        return self._matched[1]
 
     @property
     def argv(self) -> Tuple[str, ...]:
@@ -30,10 +38,7 @@ class Command:
 
     @property
     def group(self) -> Optional[str]:
-        group = self._argv[0]
-        if group in self.groups:
-            return group
-        return None
+        return self.index.longest_group(self._argv)
 
     @staticmethod
     def _similar(cmd1: str, cmd2: str, threshold: int = 1) -> bool:
@@ -45,67 +50,71 @@ class Command:
 
     @cached_property
     def match(self) -> Optional[str]:
+        return self._matched[0]
+
+    @cached_property
+    def _matched(self) -> Tuple[Optional[str], int]:
+        """The matched command name and how many words of argv it took.
+        """
         if not self._argv:
-            return None
-
-        for size, direction in ((2, 1), (1, 1), (2, -1)):
-            command_name = ' '.join(self._argv[:size][::direction])
-            if command_name in self.commands:
-                return command_name
-
-        # specified the only one word from command
-        commands_by_parts = defaultdict(list)  # type: DefaultDict[str, List[str]]
-        for command_name in self.commands:
-            for part in command_name.split():
-                commands_by_parts[part].append(command_name)
-        command_names = commands_by_parts[self._argv[0]]
-        if len(command_names) == 1:
-            return command_names[0]
+            return None, 0
+
+        command_name, size = self.index.longest_match(self._argv)
+        if command_name is not None:
+            return self.index.get(command_name), size
+
+        # reversed words or the only one word from command
+        for size in (2, 1):
+            command_name = self.index.shortcuts.get(' '.join(self._argv[:size]))
+            if command_name is not None:
+                return self.index.get(command_name), size
 
         # typo in command name
-        for size in (1, 2):
+        for size in range(1, min(len(self._argv), self.index.depth) + 1):
             command_name = ' '.join(self._argv[:size])
-            for command_guess in self.commands:
-                if self._similar(command_name, command_guess):
-                    return command_guess
+            for command_guess in self.index.similar(command_name, limit=1):
+                return self.index.get(command_guess), size
 
-        return None
+        return None, 0
 
     @cached_property
     def guesses(self) -> FrozenSet[str]:
-        guesses = set()
+        return frozenset(self.suggestions)
 
+    @cached_property
+    def suggestions(self) -> Tuple[str, ...]:
+        """Possible commands for not matched argv, the most relevant first.
+        """
         if self.group:
-            for command in self.commands:
-                if command.startswith(self.group + ' '):
-                    guesses.add(command)
-            return frozenset(guesses)
+            members = self.index.members(self.group)
+            return tuple(self.index.names[command] for command in members)
 
         # typed only one word from two words
+        guesses = []  # type: List[str]
         for name in self.argv[:2]:
-            for command_name in self.commands:
-                _, _, subcommand_name = command_name.rpartition(' ')
-                if name == subcommand_name:
-                    guesses.add(command_name)
+            guesses.extend(self.index.subcommands.get(name, ()))
         if guesses:
-            return frozenset(guesses)
+            return self._unique(guesses)
 
         # typed fully but with too many mistakes
         for size in 1, 2:
             name = ' '.join(self._argv[:size])
-            for command_name in self.commands:
-                if self._similar(name, command_name, threshold=3):
-                    guesses.add(command_name)
+            guesses.extend(self.index.similar(name, threshold=3, limit=self.max_guesses))
         if guesses:
-            return frozenset(guesses)
+            return self._unique(guesses)
 
         # typed only one word from two, and it contains typos
         for name in self.argv[:2]:
-            for command_name in self.commands:
-                for part in command_name.split():
-                    if self._similar(name, part):
-                        guesses.add(command_name)
+            guesses.extend(self.index.similar_parts(name, limit=self.max_guesses))
         if guesses:
-            return frozenset(guesses)
+            return self._unique(guesses)
+
+        return ()
 
-        return frozenset()
+    def _unique(self, commands: Iterable[str]) -> Tuple[str, ...]:
+        result = []  # type: List[str]
+        for command in commands:
+            name = self.index.names[command]
+            if name not in result:
+                result.append(name)
+        return tuple(result)
@@ -0,0 +1,85 @@
+# built-in
+import re
+from typing import TYPE_CHECKING, List, Sequence
+
+# app
+from ._lazy import LazyHandler
+from ._manifest import get_options
+
+
+if TYPE_CHECKING:
+    # app
+    from ._parser import Parser
+
+
+REX_NOT_WORD = re.compile(r'\W')
+
+BASH_TEMPLATE = r"""
+_{func}_complete() {{
+    local IFS=$'\n'
+    COMPREPLY=( $("${{COMP_WORDS[0]}}" __complete "${{COMP_WORDS[@]:1:COMP_CWORD}}") )
+}}
+complete -o default -F _{func}_complete {prog}
+"""
+
+ZSH_TEMPLATE = r"""
+#compdef {prog}
+_{func}_complete() {{
+    local -a candidates
+    candidates=("${{(@f)$({prog} __complete "${{(@)words[2,CURRENT]}}")}}")
+    compadd -- $candidates
+}}
+compdef _{func}_complete {prog}
+"""
+
+FISH_TEMPLATE = r"""
+complete -c {prog} -f -a '({prog} __complete (commandline -opc)[2..-1] (commandline -ct))'
+"""
+
+TEMPLATES = dict(
+    bash=BASH_TEMPLATE,
+    zsh=ZSH_TEMPLATE,
+    fish=FISH_TEMPLATE,
+)
+
+
+def get_script(prog: str, shell: str) -> str:
+    """Completion script for the shell that calls `prog __complete`.
+    """
+    if shell not in TEMPLATES:
+        raise ValueError('unsupported shell: ' + repr(shell))
+    return TEMPLATES[shell].format(
+        prog=prog,
+        func=REX_NOT_WORD.sub('_', prog),
+    ).lstrip()
+
+
+def complete(parser: 'Parser', words: Sequence[str]) -> List[str]:
+    """Candidates for the last word in words.
+
+    Only the parser of the matched command is built (if it's unknown from the manifest),
+    and no handler is called.
+    """
+    done = list(words[:-1])
+    prefix = words[-1] if words else ''
+    if done and done[0] in ('--help', 'help'):
+        done = done[1:]
+
+    # command name isn't typed yet, complete the next word of it
+    if not prefix.startswith('-'):
+        candidates = parser._index.next_words(done)
+        if candidates:
+            return sorted(c for c in candidates if c.startswith(prefix))
+
+    # command name is typed, complete options
+    command = parser._make_command(argv=done)
+    if not command.match:
+        return []
+    handler = parser._handlers[command.match]
+    options = handler.options if isinstance(handler, LazyHandler) else None
+    if options is None:
+        command_handler = parser._get_command(command=command)
+        if command_handler is None:
+            return []
+        options = get_options(command_handler.parser)
+    return sorted(o for o in options if o.startswith(prefix))
@@ -0,0 +1,26 @@
+# built-in
+import os
+
+
+def write_atomic(path: str, content: str) -> None:
+    """Write the text into a temporary file and then replace the file at the path by it.
+
+    Readers never see a broken file, and concurrent writers never share
+    the temporary file. The temporary file is removed if writing fails.
+    """
+    # tempfile is slow to import and required only here
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with open(fd, 'w', encoding='utf8') as stream:
+            stream.write(content)
+        # mkstemp makes the file readable only by the owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,60 @@
+# built-in
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+# app
+from ._files import write_atomic
+from ._manifest import is_fresh, make_manifest
+
+
+if TYPE_CHECKING:
+    # app
+    from ._parser import Parser
+
+
+HEADER = '# generated by dephell_argparse, do not edit\n'
+
+
+def make_frozen(parser: 'Parser', version: str = None) -> str:
+    """Source code of the module with registered commands and rendered help.
+    """
+    manifest = make_manifest(parser=parser, version=version)
+    lines = [
+        HEADER,
+        'FORMAT = {!r}'.format(manifest['format']),
+        'VERSION = {!r}'.format(manifest['version']),
+        'SOURCES = {!r}'.format(manifest['sources']),
+        'COMMANDS = [',
+    ]  # type: List[str]
+    for command in manifest['commands']:
+        lines.append('    {!r},'.format(command))
+    lines.extend([
+        ']',
+        'HELP_PARAMS = {!r}'.format(parser._get_help_params()),
+        'HELP = {!r}'.format(parser._render_help()),
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def dump_frozen(parser: 'Parser', path: str, version: str = None) -> None:
+    write_atomic(path, make_frozen(parser=parser, version=version))
+
+
+def read_frozen(module: str, version: str = None) -> Optional[Dict[str, Any]]:
+    """Import the frozen module. Returns None if it's missed, broken or stale.
+    """
+    try:
+        frozen = import_module(module)
+        manifest = dict(
+            format=frozen.FORMAT,
+            version=frozen.VERSION,
+            sources=frozen.SOURCES,
+            commands=frozen.COMMANDS,
+            help_params=frozen.HELP_PARAMS,
+            help=frozen.HELP,
+        )
+    except (ImportError, AttributeError, SyntaxError):
+        return None
+    if not is_fresh(manifest, version=version):
+        return None
+    return manifest
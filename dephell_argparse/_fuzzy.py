@@ -0,0 +1,149 @@
+# built-in
+from bisect import bisect, bisect_left, insort
+from collections import defaultdict
+from typing import DefaultDict, Dict, Iterable, List, Set, Tuple
+
+
+def _signature(word: str) -> str:
+    return ''.join(sorted(word))
+
+
+def distance(left: str, right: str) -> int:
+    """Size of the symmetric difference of characters of two signatures.
+
+    Signatures are words with sorted characters (see `_signature`).
+    """
+    i = j = same = 0
+    while i < len(left) and j < len(right):
+        if left[i] == right[j]:
+            same += 1
+            i += 1
+            j += 1
+        elif left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return len(left) + len(right) - 2 * same
+
+
+class FuzzyIndex:
+    """Words index to find the closest words by characters.
+
+    The distance between words is the amount of characters
+    that one word has and another doesn't (see `Command._similar`).
+    For threshold up to 1 candidates are found by sorted characters signatures
+    with one character deleted or inserted, without any scan.
+    For bigger thresholds sorted signatures of every length are walked as a trie,
+    and branches that cannot fit into the threshold are skipped (see `_walk`).
+    Only one signature string is stored for every word to keep it compact.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        self._words = dict()  # type: Dict[str, str]
+        self._signatures = defaultdict(list)  # type: DefaultDict[str, List[str]]
+        # sorted unique signatures by length
+        self._sorted = defaultdict(list)  # type: DefaultDict[int, List[str]]
+        self._alphabet = set()  # type: Set[str]
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        if word in self._words:
+            return
+        signature = _signature(word)
+        self._words[word] = signature
+        if signature not in self._signatures:
+            insort(self._sorted[len(signature)], signature)
+        self._signatures[signature].append(word)
+        self._alphabet.update(signature)
+
+    def _candidates(self, word: str, threshold: int) -> Set[str]:
+        candidates = set()  # type: Set[str]
+        signature = _signature(word)
+        if threshold > 1:
+            for length in range(max(len(word) - threshold, 0), len(word) + threshold + 1):
+                for found in self._walk(signature, threshold, length):
+                    candidates.update(self._signatures[found])
+            return candidates
+
+        candidates.update(self._signatures.get(signature, ()))
+        if threshold < 1:
+            return candidates
+        # the candidate has one less character
+        for index in range(len(signature)):
+            deleted = signature[:index] + signature[index + 1:]
+            candidates.update(self._signatures.get(deleted, ()))
+        # the candidate has one more character
+        for char in self._alphabet:
+            index = bisect(signature, char)
+            inserted = signature[:index] + char + signature[index:]
+            candidates.update(self._signatures.get(inserted, ()))
+        return candidates
+
+    def _walk(self, signature: str, threshold: int, length: int) -> List[str]:
+        """Signatures of the given length in distance not bigger than threshold.
+
+        A range of sorted signatures with the same prefix is a trie node.
+        Both prefix and signature are sorted, so they are merged char by char,
+        and the cost of the node is how many chars were deleted or inserted so far.
+        Nodes are skipped when the cost together with the difference of lengths
+        that are left exceeds the threshold.
+        """
+        signatures = self._sorted.get(length)
+        if not signatures:
+            return []
+        size = len(signature)
+        found = []
+        # the range of signatures, the prefix length, position in signature, and cost
+        stack = [(0, len(signatures), 0, 0, 0)]  # type: List[Tuple[int, int, int, int, int]]
+        while stack:
+            low, high, depth, pos, cost = stack.pop()
+            if depth == length:
+                if cost + size - pos <= threshold:
+                    found.append(signatures[low])
+                continue
+            prefix = signatures[low][:depth]
+            left = length - depth - 1
+            # children with the next char of the signature, some chars before it are deleted
+            for index in range(pos, min(pos + threshold - cost + 1, size)):
+                char = signature[index]
+                if index > pos and char == signature[index - 1]:
+                    continue
+                new_cost = cost + index - pos
+                if new_cost + abs(left - (size - index - 1)) > threshold:
+                    continue
+                child_low = bisect_left(signatures, prefix + char, low, high)
+                child_high = bisect_left(signatures, prefix + chr(ord(char) + 1), child_low, high)
+                if child_low < child_high:
+                    stack.append((child_low, child_high, depth + 1, index + 1, new_cost))
+            # children with an inserted char
+            if cost + 1 + abs(left - (size - pos)) > threshold:
+                continue
+            while low < high:
+                char = signatures[low][depth]
+                child_high = bisect_left(signatures, prefix + chr(ord(char) + 1), low, high)
+                index = bisect_left(signature, char, pos)
+                if index == size or signature[index] != char:
+                    new_cost = cost + index - pos + 1
+                    if new_cost + abs(left - (size - index)) <= threshold:
+                        stack.append((low, child_high, depth + 1, index, new_cost))
+                low = child_high
+        return found
+
+    def search(self, word: str, threshold: int = 1, limit: int = None) -> List[str]:
+        """Words in distance not bigger than threshold, the closest first.
+        """
+        signature = _signature(word)
+        scored = []  # type: List[Tuple[int, str]]
+        for candidate in self._candidates(word, threshold):
+            diff = distance(signature, self._words[candidate])
+            if diff <= threshold:
+                scored.append((diff, candidate))
+        scored.sort()
+        return [candidate for _, candidate in scored[:limit]]
+
+    def __contains__(self, word: object) -> bool:
+        return word in self._words
+
+    def __len__(self) -> int:
+        return len(self._words)
@@ -3,22 +3,58 @@ import os
 import re
 import sys
 from argparse import ArgumentParser, Namespace
-from inspect import getdoc
 from logging import getLogger
 from textwrap import dedent
-from typing import IO, Iterable, Optional
+from typing import IO, Iterable, List, Optional
 
 # app
 from ._cached_property import cached_property
+from ._profile import Profile, phase
 
 
 REX_WORD = re.compile(r'([a-z\d])([A-Z])')
 
 
+def make_name(raw: str, is_class: bool) -> str:
+    """Get command name from the name of handler class or function.
+    """
+    if is_class:
+        result = REX_WORD.sub(r'\1 \2', raw).split()
+    else:
+        result = raw.split('_')
+    result = [word.strip() for word in result]
+    result = [word.lower() for word in result if word]
+    if result[-1] == 'handler':
+        result = result[:-1]
+    if result[-1] == 'command':
+        result = result[:-1]
+    return ' '.join(result)
+
+
+class _SysStream:
+    """Get the stream from sys on every access to respect redirects.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, obj, cls) -> IO:
+        return getattr(sys, self.name)
+
+
 class CommandHandler:
     logger = getLogger('dephell_argparse')
-    stream = sys.stdout
+    stream = _SysStream('stdout')
     argv = None
+    profile = None  # type: Optional[Profile]
+    # format of records returned by the handler, from `--format`
+    output_format = None  # type: Optional[str]
+    # how many characters `write_lines` collects before writing them into the stream
+    buffer_size = 64 * 1024
+    # attributes that belong to one call and aren't copied
+    _per_call = frozenset({'args', 'profile', 'output_format', '_output', '_output_size'})
+    _output = None  # type: Optional[List[str]]
+    _output_size = 0
 
     def __init__(self, *, handler=None, argv: Iterable[str] = None, **kwargs):
         for key, value in kwargs.items():
@@ -29,7 +65,7 @@ class CommandHandler:
             self.argv = tuple(argv)
 
     def copy(self, **kwargs) -> 'CommandHandler':
-        params = vars(self).copy()
+        params = {key: value for key, value in vars(self).items() if key not in self._per_call}
         params.update(kwargs)
         return type(self)(**params)
 
@@ -46,38 +82,77 @@ class CommandHandler:
 
     def print(self, *args, sep: str = ' ', end: str = '\n',
               stream: IO = None, flush: bool = False) -> None:
+        # keep the order of lines if `write_lines` is used as well
+        if self._output:
+            self.flush()
         print(*args, sep=sep, end=end, file=stream or self.stream, flush=flush)
 
+    def write_lines(self, lines: Iterable[str], end: str = '\n') -> None:
+        """Write lines into the stream by big chunks.
+
+        Lines are collected in the buffer, and written when it has
+        `buffer_size` characters, on `flush`, and when the command is done
+        if it is called from `Parser.handle`.
+        """
+        output = self._output
+        if output is None:
+            output = self._output = []
+        size = self._output_size
+        limit = self.buffer_size
+        for line in lines:
+            line += end
+            output.append(line)
+            size += len(line)
+            if size >= limit:
+                self._write(''.join(output))
+                output.clear()
+                size = 0
+        self._output_size = size
+
+    def flush(self) -> None:
+        """Write all buffered lines into the stream.
+        """
+        if self._output:
+            self._write(''.join(self._output))
+            self._output.clear()
+        self._output_size = 0
+
+    def _write(self, text: str) -> None:
+        stream = self.stream
+        raw = getattr(stream, 'buffer', None)
+        encoding = getattr(stream, 'encoding', None)
+        # skip the text layer if there is no newlines translation.
+        # Text wrappers don't tell what newline they use, so it's known only
+        # for the standard streams made by Python, they translate into `os.linesep`.
+        standard = stream is sys.__stdout__ or stream is sys.__stderr__
+        if not standard or raw is None or not encoding or os.linesep != '\n':
+            stream.write(text)
+            return
+        # write text that is already in the text layer first
+        stream.flush()
+        raw.write(text.encode(encoding, getattr(stream, 'errors', None) or 'strict'))
+
     # defaults
 
     @cached_property
     def parser(self) -> ArgumentParser:
         from ._parser import Parser
 
-        parser = Parser(
-            prog=self.prog + ' ' + self.name,
-            usage=self.usage,
-            description=self.description,
-            url=self.url,
-            epilog=self.epilog,
-        )
-        return self.build_parser(parser=parser)
+        with phase(self.profile, 'parser'):
+            parser = Parser(
+                prog=self.prog + ' ' + self.name,
+                usage=self.usage,
+                description=self.description,
+                url=self.url,
+                epilog=self.epilog,
+            )
+            return self.build_parser(parser=parser)
 
     @cached_property
     def name(self) -> str:
         if self.handler is not None:
-            raw = self.handler.__name__
-            result = raw.split('_')
-        else:
-            raw = type(self).__name__
-            result = REX_WORD.sub(r'\1 \2', raw).split()
-        result = [word.strip() for word in result]
-        result = [word.lower() for word in result if word]
-        if result[-1] == 'handler':
-            result = result[:-1]
-        if result[-1] == 'command':
-            result = result[:-1]
-        return ' '.join(result)
+            return make_name(self.handler.__name__, is_class=False)
+        return make_name(type(self).__name__, is_class=True)
 
     @cached_property
     def prog(self) -> str:
@@ -101,6 +176,9 @@ class CommandHandler:
         return dedent(doc).strip()
 
     def _get_docstring(self) -> str:
+        # inspect is slow to import and required only here
+        from inspect import getdoc
+
         doc = getdoc(type(self))
         if doc is not None:
             return doc
@@ -113,8 +191,11 @@ class CommandHandler:
 
     @cached_property
     def summary(self) -> str:
-        return self.parser.description.split('\n')[0]
+        # don't build the parser only to show the command in the list
+        return self.description.split('\n')[0]
 
     @cached_property
     def args(self) -> Namespace:
-        return self.parser.parse_args(self.argv)
+        parser = self.parser
+        with phase(self.profile, 'parse_args'):
+            return parser.parse_args(self.argv)
@@ -0,0 +1,43 @@
+# built-in
+import sys
+from collections import namedtuple
+from time import perf_counter
+from typing import List, Sequence
+
+# app
+from ._lazy import LazyHandler
+
+
+ImportCost = namedtuple('ImportCost', ['command', 'path', 'seconds', 'modules'])
+
+
+def load_measured(record: LazyHandler) -> ImportCost:
+    """Import the handler of the lazy command and measure it.
+
+    Modules shared by many commands are counted only for the first imported one.
+    """
+    modules = len(sys.modules)
+    start = perf_counter()
+    record.load()
+    return ImportCost(
+        command=record.name,
+        path=record.path,
+        seconds=perf_counter() - start,
+        modules=len(sys.modules) - modules,
+    )
+
+
+def format_report(costs: Sequence[ImportCost], eager: int = 0) -> str:
+    """Text report about imports of commands, in the given order.
+    """
+    lines = ['imports: {} lazy commands'.format(len(costs))]  # type: List[str]
+    line = '  {:>10.3f} ms {:>6} modules  {} ({})'
+    for cost in costs:
+        lines.append(line.format(cost.seconds * 1000, cost.modules, cost.command, cost.path))
+    total = sum(cost.seconds for cost in costs)
+    modules = sum(cost.modules for cost in costs)
+    lines.append('  {:>10.3f} ms {:>6} modules  total'.format(total * 1000, modules))
+    if eager:
+        msg = '  {} commands are imported before registration, register them by import path to measure'
+        lines.append(msg.format(eager))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,150 @@
+# built-in
+import sys
+from collections import defaultdict
+from typing import DefaultDict, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# app
+from ._cached_property import cached_property
+from ._fuzzy import FuzzyIndex
+from ._trie import WordTrie
+
+
+class CommandsIndex:
+    """Incrementally maintained lookup tables over registered command names.
+
+    The index is owned by `Parser` and updated on every `add_command`,
+    so `Command` can resolve names without rebuilding anything.
+    """
+
+    def __init__(self, commands: Iterable[str] = ()):
+        # lower-cased name -> registered name
+        self.names = dict()  # type: Dict[str, str]
+        # words of names, resolves names and groups of any depth
+        self.trie = WordTrie()
+        # all groups of commands: every words prefix of every name
+        self.groups = set()  # type: Set[str]
+        # the biggest amount of words in a name
+        self.depth = 0
+        # reversed two words and a word that only one name has -> the name,
+        # or None if the word is in many names
+        self.shortcuts = dict()  # type: Dict[str, Optional[str]]
+        # every word of the name -> commands containing it
+        self.parts = defaultdict(list)  # type: DefaultDict[str, List[str]]
+        # the last word of the name -> commands ending with it
+        self.subcommands = defaultdict(list)  # type: DefaultDict[str, List[str]]
+        # incremented on every change, useful to invalidate derived caches
+        self.version = 0
+        for name in commands:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        # interned strings are shared by all the tables
+        key = sys.intern(name.lower())
+        self.version += 1
+        if key in self.names:
+            self.names[key] = name
+            return
+        self.names[key] = name
+
+        words = [sys.intern(word) for word in key.split()]
+        self.trie.add(words, key)
+        self.depth = max(self.depth, len(words))
+        for size in range(1, len(words)):
+            self.groups.add(sys.intern(' '.join(words[:size])))
+        self.subcommands[words[-1]].append(key)
+
+        # fuzzy indices are updated only if they are already built
+        built = vars(self)
+        if 'fuzzy_names' in built:
+            self.fuzzy_names.add(key)
+        for part in words:
+            self.parts[part].append(key)
+            if 'fuzzy_parts' in built:
+                self.fuzzy_parts.add(part)
+            self._add_shortcut(part, key)
+        if len(words) == 2:
+            self._add_shortcut(sys.intern(words[1] + ' ' + words[0]), key)
+
+    def _add_shortcut(self, shortcut: str, key: str) -> None:
+        if self.shortcuts.get(shortcut, key) == key:
+            self.shortcuts[shortcut] = key
+        else:
+            # ambiguous, but remember it to not add it again
+            self.shortcuts[shortcut] = None
+
+    def longest_match(self, words: Sequence[str]) -> Tuple[Optional[str], int]:
+        """The longest name that words start with and its amount of words.
+        """
+        name = None
+        size = 0
+        for depth, node in self.trie.walk(words):
+            if node.name is not None:
+                name = node.name
+                size = depth
+        return name, size
+
+    def longest_group(self, words: Sequence[str]) -> Optional[str]:
+        """The deepest group that words start with.
+        """
+        size = 0
+        for depth, node in self.trie.walk(words):
+            if node.children:
+                size = depth
+        if not size:
+            return None
+        return ' '.join(words[:size])
+
+    def members(self, group: str) -> List[str]:
+        """All commands in the group and its subgroups.
+        """
+        node = self.trie.find(group.split())
+        if node is None or not node.children:
+            return []
+        return [name for child in node.children.values() for name in child]
+
+    def next_words(self, words: Sequence[str]) -> List[str]:
+        """Words that can follow the given ones in command names.
+        """
+        node = self.trie.find(words)
+        if node is None or not node.children:
+            return []
+        return list(node.children)
+
+    # fuzzy matching is needed only for typos, so it's built on the first typo
+
+    @cached_property
+    def fuzzy_names(self) -> FuzzyIndex:
+        return FuzzyIndex(self.names)
+
+    @cached_property
+    def fuzzy_parts(self) -> FuzzyIndex:
+        return FuzzyIndex(self.parts)
+
+    def similar(self, name: str, threshold: int = 1, limit: int = None) -> List[str]:
+        """Commands with names similar to the given one, the closest first.
+        """
+        return self.fuzzy_names.search(name, threshold=threshold, limit=limit)
+
+    def similar_parts(self, word: str, threshold: int = 1, limit: int = None) -> List[str]:
+        """Commands with a word similar to the given one, the closest first.
+        """
+        result = []  # type: List[str]
+        seen = set()  # type: Set[str]
+        for part in self.fuzzy_parts.search(word, threshold=threshold):
+            for command in self.parts[part]:
+                if command not in seen:
+                    seen.add(command)
+                    result.append(command)
+        return result[:limit]
+
+    def get(self, name: str) -> Optional[str]:
+        return self.names.get(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
@@ -0,0 +1,68 @@
+# built-in
+import sys
+from argparse import ArgumentParser
+from importlib import import_module
+from typing import Any, List, Optional
+
+# app
+from ._handler import CommandHandler, make_name
+
+
+def get_name(target: Any) -> str:
+    """Command name for handler class or function without making the handler.
+    """
+    if not isinstance(target, type):
+        return make_name(target.__name__, is_class=False)
+    name = getattr(target, 'name', None)
+    if isinstance(name, str):
+        return name
+    if name is CommandHandler.__dict__['name']:
+        return make_name(target.__name__, is_class=True)
+    # the name is re-defined by a custom property
+    return target().name
+
+
+class LazyHandler:
+    """Compact record of registered command. The handler is made only when needed.
+
+    The record is made for handler classes and functions, and for import paths
+    like `package.module:Command`. In the last case, the module is imported
+    only when the command is called, or its summary is required and wasn't specified.
+    """
+    __slots__ = ('name', 'path', 'target', 'summary', 'parser', 'options')
+
+    def __init__(self, path: str = None, name: str = None, summary: str = None,
+                 parser: ArgumentParser = None, options: List[str] = None,
+                 target: Any = None):
+        if target is None:
+            module, _, attr = (path or '').partition(':')
+            if not module or not attr:
+                raise ValueError('invalid import path for command: ' + repr(path))
+            if name is None:
+                raw = attr.rpartition('.')[-1]
+                name = make_name(raw, is_class=raw[:1].isupper())
+        elif name is None:
+            name = get_name(target)
+
+        self.name = sys.intern(name)
+        self.path = path
+        self.target = target
+        self.summary = summary  # type: Optional[str]
+        self.parser = parser
+        # option strings of the command if known without import
+        self.options = options
+
+    def load(self) -> Any:
+        if self.target is not None:
+            return self.target
+        # the path is checked in __init__ if there is no target
+        assert self.path is not None
+        module_name, _, attr = self.path.partition(':')
+        target = import_module(module_name)
+        for part in attr.split('.'):
+            target = getattr(target, part)
+        self.target = target
+        return target
+
+    def __repr__(self) -> str:
+        return '{}({!r}, name={!r})'.format(type(self).__name__, self.path or self.target, self.name)
@@ -0,0 +1,141 @@
+# built-in
+import os
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+# app
+from ._cached_property import cached_property
+from ._files import write_atomic
+from ._handler import CommandHandler
+from ._lazy import LazyHandler
+
+
+if TYPE_CHECKING:
+    # app
+    from ._parser import Parser
+
+
+# bump it on every incompatible change of the manifest format
+MANIFEST_FORMAT = 1
+
+
+def get_import_path(handler: CommandHandler) -> str:
+    """Import path like `package.module:Command` for registered handler.
+    """
+    target = handler.handler if handler.handler is not None else type(handler)
+    qualname = getattr(target, '__qualname__', '')
+    if not qualname or '<' in qualname:
+        raise ValueError('cannot get import path for command ' + repr(handler.name))
+    return target.__module__ + ':' + qualname
+
+
+def get_lost_state(record: Union[CommandHandler, LazyHandler]) -> List[str]:
+    """Names of attributes of registered command that cannot be restored from the manifest.
+
+    The manifest keeps only the import path, name and summary of the command,
+    so a custom parser or a state of the handler instance would be silently lost.
+    """
+    if isinstance(record, LazyHandler):
+        return ['parser'] if record.parser is not None else []
+    lost = []
+    cls = type(record)
+    if record.handler is not None and cls is not CommandHandler:
+        lost.append('handler')
+    for key, value in vars(record).items():
+        if key in ('handler', 'name', 'summary') or key in record._per_call:
+            continue
+        prop = getattr(cls, key, None)
+        # default value computed by the handler itself is computed again after loading
+        if key != 'parser' and isinstance(prop, cached_property) and prop.func(record) == value:
+            continue
+        lost.append(key)
+    return sorted(lost)
+
+
+def get_options(parser) -> List[str]:
+    """All option strings of the parser, used for shell completion.
+    """
+    options = []  # type: List[str]
+    for action in parser._actions:
+        options.extend(action.option_strings)
+    return options
+
+
+def get_source(path: str) -> Optional[str]:
+    """Path to the file where the handler is defined.
+    """
+    module = sys.modules.get(path.partition(':')[0])
+    return getattr(module, '__file__', None)
+
+
+def get_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def make_manifest(parser: 'Parser', version: str = None) -> Dict[str, Any]:
+    commands = []
+    sources = dict()  # type: Dict[str, Optional[float]]
+    for name in list(parser._handlers):
+        lazy = parser._handlers[name]
+        lost = get_lost_state(lazy)
+        if lost:
+            raise ValueError('cannot save {} of command {!r} into manifest'.format(
+                ', '.join(lost), name,
+            ))
+        handler = parser._resolve_handler(name)
+        if isinstance(lazy, LazyHandler) and lazy.path:
+            path = lazy.path
+        else:
+            path = get_import_path(handler)
+        commands.append(dict(
+            name=name,
+            path=path,
+            summary=handler.summary,
+            # build the parser on a copy to not keep it in the registered handler
+            options=get_options(handler.copy().parser),
+        ))
+        source = get_source(path)
+        if source:
+            sources[source] = get_mtime(source)
+    return dict(
+        format=MANIFEST_FORMAT,
+        version=version,
+        sources=sources,
+        commands=commands,
+    )
+
+
+def is_fresh(manifest: Dict[str, Any], version: str = None) -> bool:
+    if manifest.get('format') != MANIFEST_FORMAT:
+        return False
+    if manifest.get('version') != version:
+        return False
+    for source, mtime in (manifest.get('sources') or {}).items():
+        if get_mtime(source) != mtime:
+            return False
+    return True
+
+
+def dump_manifest(parser: 'Parser', path: str, version: str = None) -> None:
+    import json
+
+    manifest = make_manifest(parser=parser, version=version)
+    write_atomic(path, json.dumps(manifest, sort_keys=True))
+
+
+def read_manifest(path: str, version: str = None) -> Optional[Dict[str, Any]]:
+    """Read manifest from the disk. Returns None if it's missed, broken or stale.
+    """
+    import json
+
+    try:
+        with open(path, encoding='utf8') as stream:
+            manifest = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not is_fresh(manifest, version=version):
+        return None
+    return manifest
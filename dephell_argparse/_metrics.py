@@ -0,0 +1,120 @@
+# built-in
+from threading import Lock
+from typing import Any, Dict, List
+
+# app
+from ._files import write_atomic
+from ._profile import Profile
+
+
+class CommandStats:
+    """Resources used by all invocations of one command.
+    """
+    __slots__ = ('calls', 'codes', 'wall', 'user', 'sys', 'maxrss', 'maxrss_max', 'memory_max')
+
+    def __init__(self):
+        self.calls = 0
+        # exit code -> invocations, `error` for unhandled exceptions
+        self.codes = dict()  # type: Dict[str, int]
+        self.wall = 0.0
+        self.user = 0.0
+        self.sys = 0.0
+        self.maxrss = 0
+        self.maxrss_max = 0
+        self.memory_max = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Resources used by commands, aggregated in memory by command name.
+
+    Pass it into `Parser(metrics=...)` to measure every `handle` call
+    that runs a command: wall time, CPU user and system time, growth of max RSS,
+    and peak of traced memory if `trace_memory` is enabled or tracemalloc is already tracing.
+    """
+
+    def __init__(self, trace_memory: bool = False, prefix: str = 'dephell_argparse'):
+        self.prefix = prefix
+        self._stats = dict()  # type: Dict[str, CommandStats]
+        self._lock = Lock()
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def add(self, profile: Profile) -> None:
+        usage = profile.usage
+        if profile.command is None or usage is None:
+            return
+        code = 'error' if profile.code is None else str(profile.code)
+        with self._lock:
+            stats = self._stats.get(profile.command)
+            if stats is None:
+                stats = self._stats[profile.command] = CommandStats()
+            stats.calls += 1
+            stats.codes[code] = stats.codes.get(code, 0) + 1
+            stats.wall += usage.wall
+            stats.user += usage.user
+            stats.sys += usage.sys
+            stats.maxrss += usage.maxrss
+            stats.maxrss_max = max(stats.maxrss_max, usage.maxrss)
+            stats.memory_max = max(stats.memory_max, usage.memory)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of collected stats by command name.
+        """
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def as_json(self) -> str:
+        import json
+
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def as_prometheus(self) -> str:
+        """Stats in Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        metrics = (
+            ('wall_seconds_total', 'wall', 'counter', 'Wall time of the command.'),
+            ('cpu_user_seconds_total', 'user', 'counter', 'CPU time of the command in user mode.'),
+            ('cpu_system_seconds_total', 'sys', 'counter', 'CPU time of the command in system mode.'),
+            ('maxrss_growth_bytes_total', 'maxrss', 'counter', 'Growth of max RSS of the process by the command.'),
+            ('maxrss_growth_bytes_max', 'maxrss_max', 'gauge', 'The biggest growth of max RSS by one call.'),
+            ('traced_memory_peak_bytes_max', 'memory_max', 'gauge', 'The biggest peak of traced memory in one call.'),
+        )
+        name = self.prefix + '_command_calls_total'
+        lines = [
+            '# HELP {} Calls of the command by exit code.'.format(name),
+            '# TYPE {} counter'.format(name),
+        ]  # type: List[str]
+        for command, stats in sorted(snapshot.items()):
+            for code, calls in sorted(stats['codes'].items()):
+                line = '{}{{command="{}",code="{}"}} {}'
+                lines.append(line.format(name, _escape(command), _escape(code), calls))
+
+        for suffix, field, kind, description in metrics:
+            name = self.prefix + '_command_' + suffix
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for command, stats in sorted(snapshot.items()):
+                lines.append('{}{{command="{}"}} {}'.format(name, _escape(command), stats[field]))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str, kind: str = 'prometheus') -> None:
+        """Save stats as Prometheus text file or, for `kind='json'`, as JSON snapshot.
+
+        The file is replaced at once, so it's safe for the textfile collector.
+        """
+        content = self.as_json() if kind == 'json' else self.as_prometheus()
+        write_atomic(path, content)
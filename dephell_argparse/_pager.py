@@ -0,0 +1,31 @@
+# built-in
+import os
+import shlex
+import subprocess
+from typing import Iterable, Union
+
+
+DEFAULT_PAGER = 'less -R'
+
+
+def get_pager_command(pager: Union[bool, str]) -> str:
+    if isinstance(pager, str):
+        return pager
+    return os.environ.get('PAGER') or DEFAULT_PAGER
+
+
+def page(chunks: Iterable[str], command: str) -> None:
+    """Pipe text into the pager as it is produced.
+    """
+    process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, universal_newlines=True)
+    stdin = process.stdin
+    # it's always set for stdin=PIPE
+    assert stdin is not None
+    try:
+        for chunk in chunks:
+            stdin.write(chunk)
+        stdin.close()
+    except BrokenPipeError:
+        # the pager has been closed before the end of the text
+        pass
+    process.wait()
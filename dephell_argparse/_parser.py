@@ -2,13 +2,27 @@
 import argparse
 import os
 import sys
+from contextlib import contextmanager
+from threading import RLock
 from types import MappingProxyType
-from typing import IO, Dict, Optional, Sequence, Type
+from typing import IO, Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
 # app
-from ._colors import Fore
+from ._async import is_awaitable, run_awaitable
+from ._cache import CacheInfo, LRUCache
+from ._colors import get_fore
 from ._command import Command
+from ._completion import complete, get_script
+from ._freeze import dump_frozen, read_frozen
 from ._handler import CommandHandler
+from ._imports import ImportCost, format_report, load_measured
+from ._index import CommandsIndex
+from ._lazy import LazyHandler
+from ._manifest import dump_manifest, read_manifest
+from ._metrics import Metrics
+from ._plugins import get_plugins
+from ._profile import PROFILE_ENV, Profile, get_reporter, phase
+from ._records import FORMATS, get_records, write_records
 
 
 # wider terminal for modern ages
@@ -90,17 +104,44 @@ class Parser(argparse.ArgumentParser):
         ok=0,
         fail=2,
     ))
+    # from this amount of commands help is streamed instead of rendered at once
+    stream_help_from = 1000
 
     def __init__(self, *,
                  url: str = None,
-                 stream: IO = sys.stderr,
+                 stream: IO = None,
                  width: int = DEFAULT_WIDTH,
                  formatter_class: Type[argparse.HelpFormatter] = Formatter,
+                 observer: Callable[[Profile], None] = None,
+                 parsers_cache_size: Optional[int] = 128,
+                 help_per_group: int = None,
+                 pager: Union[bool, str] = False,
+                 metrics: Metrics = None,
                  **kwargs):
         self.url = url
         self.width = width
         self.stream = stream
-        self._handlers = dict()  # type: Dict[str, CommandHandler]
+        # called with timings of every `handle` call if specified
+        if observer is None:
+            observer = get_reporter(os.environ.get(PROFILE_ENV))
+        self.observer = observer
+        # resources used by commands if specified
+        self.metrics = metrics
+        # show only so many commands of every group in help
+        self.help_per_group = help_per_group
+        # show help in the pager if the output is a terminal
+        self.pager = pager
+        self._handlers = dict()  # type: Dict[str, Union[CommandHandler, LazyHandler]]
+        self._lock = RLock()
+        # built parsers of commands by command name
+        self._parsers = LRUCache(maxsize=parsers_cache_size)
+        # rendered help texts
+        self._helps = LRUCache(maxsize=16)
+        # the key and text of the help loaded by `load_frozen`, never evicted
+        self._frozen_help = None  # type: Optional[Tuple[Hashable, str]]
+        # time and modules of importing lazy commands by command name
+        self._imports = dict()  # type: Dict[str, ImportCost]
+        self._index = CommandsIndex()
         super().__init__(formatter_class=formatter_class, **kwargs)
 
     def _print_message(self, message: str, file: IO = None) -> None:
@@ -108,34 +149,246 @@ class Parser(argparse.ArgumentParser):
             return
         if file is None:
             file = self.stream
+        if file is None:
+            # resolve it on every call to respect redirects
+            file = sys.stderr
         file.write(message)
 
     def _make_command_handler(self, handler, name: str = None,
-                              parser: argparse.ArgumentParser = None) -> CommandHandler:
+                              parser: argparse.ArgumentParser = None,
+                              summary: str = None) -> Union[CommandHandler, LazyHandler]:
+        if isinstance(handler, str):
+            return LazyHandler(path=handler, name=name, summary=summary, parser=parser)
+
         if isinstance(handler, CommandHandler):
             if name is not None:
                 raise ValueError('cannot re-define name for command')
             if parser is not None:
                 raise ValueError('cannot re-define parser for command')
+            if summary is not None:
+                raise ValueError('cannot re-define summary for command')
             return handler
 
-        if isinstance(handler, type) and issubclass(handler, CommandHandler):
-            return handler(name=name, parser=parser)
+        # keep only a compact record, the handler is made when needed
+        return LazyHandler(target=handler, name=name, summary=summary, parser=parser)
 
-        return CommandHandler(name=name, parser=parser, handler=handler)
+    def _build_command_handler(self, handler, name: str = None,
+                               parser: argparse.ArgumentParser = None,
+                               summary: str = None) -> CommandHandler:
+        if isinstance(handler, type) and issubclass(handler, CommandHandler):
+            return handler(name=name, parser=parser, summary=summary)
+        return CommandHandler(name=name, parser=parser, summary=summary, handler=handler)
 
     def add_command(self, handler, name: str = None,
-                    parser: argparse.ArgumentParser = None) -> None:
+                    parser: argparse.ArgumentParser = None,
+                    summary: str = None) -> None:
+        """Register command handler.
+
+        The handler can be a `CommandHandler` subclass or instance, a function,
+        or an import path like `package.module:Command` to import it only when needed.
+        """
         handler = self._make_command_handler(
             handler=handler,
             name=name,
             parser=parser,
+            summary=summary,
         )
+        self._register(handler)
+
+    def _register(self, handler: Union[CommandHandler, LazyHandler]) -> None:
         self._handlers[handler.name] = handler
+        self._index.add(handler.name)
+        self._parsers.pop(handler.name)
+        self._helps.clear()
+
+    def parsers_cache_info(self) -> CacheInfo:
+        """Hits, misses, max size and current size of built parsers cache.
+        """
+        return self._parsers.info()
+
+    def dump_manifest(self, path: str, version: str = None) -> None:
+        """Save registered commands to load them later without importing handlers.
+
+        It imports all handlers and builds their parsers,
+        so do it once, on install or build, not on every run.
+        Raises ValueError if a command has a custom parser or a handler instance
+        with its own state, because they cannot be restored from the manifest.
+        """
+        dump_manifest(parser=self, path=path, version=version)
+
+    def load_manifest(self, path: str, version: str = None) -> bool:
+        """Register all commands from the manifest as lazy ones.
+
+        Returns False if the manifest is missed, the version is different,
+        or any source file has been changed since the manifest was dumped.
+        """
+        manifest = read_manifest(path=path, version=version)
+        if manifest is None:
+            return False
+        self._register_manifest(manifest)
+        return True
+
+    def freeze(self, path: str, version: str = None) -> None:
+        """Save registered commands and rendered help as Python module.
+
+        Load it with `load_frozen` to register commands and get help
+        without any introspection of handlers. Like `dump_manifest`,
+        it imports all handlers, so do it on build, not on every run.
+        Pass `prog` to the parser explicitly to use the rendered help.
+        """
+        dump_frozen(parser=self, path=path, version=version)
+
+    def load_frozen(self, module: str, version: str = None) -> bool:
+        """Register all commands from the frozen module as lazy ones.
+
+        Returns False if the module is missed, the version is different,
+        or any source file has been changed since the module was frozen.
+        Then register commands as usual.
+        """
+        frozen = read_frozen(module=module, version=version)
+        if frozen is None:
+            return False
+        # rendered help is valid only if the parser has the same commands and params
+        use_help = not self._handlers and frozen['help_params'] == self._get_help_params()
+        self._register_manifest(frozen)
+        if use_help:
+            self._frozen_help = (self._get_help_key(), frozen['help'])
+        return True
+
+    def _register_manifest(self, manifest: Dict[str, Any]) -> None:
+        for command in manifest['commands']:
+            self._register(LazyHandler(
+                path=command['path'],
+                name=command['name'],
+                summary=command['summary'],
+                options=command['options'],
+            ))
 
-    def format_help(self, command: Command = None):
+    def load_plugins(self, group: str, cache_path: str = None, use_cache: bool = True) -> List[str]:
+        """Register commands from entry points of the group as lazy ones.
+
+        The name of the entry point is the command name, and the value
+        is the import path of the handler. Plugin modules are imported
+        only when the command is called. Discovered entry points are cached
+        into `cache_path` until any distribution is installed or removed.
+        Returns names of registered commands.
+        """
+        names = []
+        plugins = get_plugins(group=group, cache_path=cache_path, use_cache=use_cache)
+        for name, path in plugins:
+            try:
+                handler = LazyHandler(path=path, name=name)
+            except ValueError:
+                CommandHandler.logger.warning('invalid plugin', extra=dict(name=name, path=path))
+                continue
+            self._register(handler)
+            names.append(handler.name)
+        return names
+
+    def _resolve_handler(self, name: str) -> CommandHandler:
+        record = self._handlers[name]
+        if not isinstance(record, LazyHandler):
+            return record
+        if record.target is None:
+            # import it only once even if called from many threads
+            with self._lock:
+                if record.target is None:
+                    self._imports[name] = load_measured(record)
+        handler = self._load_handler(record)
+        # handler instances are kept as is, classes and functions stay compact records
+        if isinstance(record.target, CommandHandler):
+            self._handlers[name] = handler
+        return handler
+
+    def import_costs(self) -> List[ImportCost]:
+        """Time and amount of modules of importing every lazy command imported so far.
+
+        The most expensive commands go first.
+        """
+        return sorted(self._imports.values(), key=lambda cost: cost.seconds, reverse=True)
+
+    def _debug_imports(self, argv: Sequence[str], stdout: IO = None, stderr: IO = None) -> int:
+        """Run the command, or import all commands, and report imports of commands.
+        """
+        if argv:
+            code = self._run(argv=argv, stdout=stdout, stderr=stderr)
+        else:
+            for name in list(self._handlers):
+                self._resolve_handler(name)
+            code = self.codes['ok']
+        eager = sum(1 for record in list(self._handlers.values())
+                    if not isinstance(record, LazyHandler) or not record.path)
+        self._print_message(format_report(self.import_costs(), eager=eager), file=stderr)
+        return code
+
+    def _load_handler(self, lazy: LazyHandler) -> CommandHandler:
+        target = lazy.load()
+        if not isinstance(target, CommandHandler):
+            return self._build_command_handler(
+                handler=target,
+                name=lazy.name,
+                parser=lazy.parser,
+                summary=lazy.summary,
+            )
+        if target.name != lazy.name:
+            return target.copy(name=lazy.name)
+        return target
+
+    def _get_summary(self, name: str) -> str:
+        record = self._handlers[name]
+        if not isinstance(record, LazyHandler):
+            return record.summary
+        if record.summary is None:
+            record.summary = self._resolve_handler(name).summary
+        return record.summary
+
+    def format_help(self, command: Command = None) -> str:
+        """Render help, or get it from the cache if nothing has been changed since.
+        """
+        key = self._get_help_key(command=command)
+        text = self._get_cached_help(key)
+        if text is None:
+            text = self._render_help(command=command)
+            self._helps.put(key, text)
+        return text
+
+    def _get_cached_help(self, key: Hashable) -> Optional[str]:
+        frozen = self._frozen_help
+        # the key has the index version, so the frozen help is dropped by any new command
+        if frozen is not None and frozen[0] == key:
+            return frozen[1]
+        return self._helps.get(key)
+
+    def _get_help_key(self, command: Command = None) -> Hashable:
+        context = None
+        if command is not None:
+            context = (command.match, command.group, command.guesses)
+        return (self._index.version, context) + self._get_help_params()
+
+    def _get_help_params(self) -> Tuple[Any, ...]:
+        """Params of the parser itself that help depends on.
+        """
+        return (
+            self.width,
+            get_fore().RESET,
+            len(self._actions),
+            self.prog,
+            self.usage,
+            self.description,
+            self.url,
+            self.epilog,
+        )
+
+    def _render_help(self, command: Command = None) -> str:
         formatter = self._get_formatter()
-        colorize = (Fore.YELLOW + '{}' + Fore.RESET).format
+        self._add_header(formatter=formatter, command=command)
+        self._format_commands(formatter=formatter, command=command)
+        self._add_footer(formatter=formatter)
+        return formatter.format_help()
+
+    def _add_header(self, formatter: argparse.HelpFormatter, command: Command = None) -> None:
+        fore = get_fore()
+        colorize = (fore.YELLOW + '{}' + fore.RESET).format
 
         if self.usage:
             formatter.add_usage(
@@ -147,7 +400,7 @@ class Parser(argparse.ArgumentParser):
 
         if command and not command.match and not command.group:
             msg = '{}ERROR:{} command not found'
-            formatter.add_text(msg.format(Fore.RED, Fore.RESET))
+            formatter.add_text(msg.format(fore.RED, fore.RESET))
 
         if self.description:
             formatter.add_text(colorize(self.prefixes['description']) + self.description)
@@ -160,10 +413,93 @@ class Parser(argparse.ArgumentParser):
             formatter.add_text(action_group.description)
             formatter.add_arguments(action_group._group_actions)
             formatter.end_section()
-        self._format_commands(formatter=formatter, command=command)
+
+    def _add_footer(self, formatter: argparse.HelpFormatter) -> None:
+        fore = get_fore()
         if self.epilog:
-            formatter.add_text(colorize(self.prefixes['epilog']) + self.epilog)
-        return formatter.format_help()
+            formatter.add_text(fore.YELLOW + self.prefixes['epilog'] + fore.RESET + self.epilog)
+
+    def iter_help(self, command: Command = None, per_group: int = None) -> Iterator[str]:
+        """Render help by chunks: the header, every command row, and the footer.
+
+        Rows are rendered one by one when requested, so the first lines
+        can be shown before all commands are rendered, and the whole text
+        is never kept in memory. With `per_group` only the first `per_group`
+        commands of every group are shown, and the rest are collapsed.
+        """
+        fore = get_fore()
+        formatter = self._get_formatter()
+        # align summaries of options and commands to the same column
+        # as `format_help` does, it doesn't require summaries of commands
+        colors = {True: fore.GREEN, False: fore.BLUE}
+        indent = formatter._current_indent + formatter._indent_increment
+        for name, color in self._iter_command_names(command=command):
+            action = self._make_command_action(name=colors[color] + name + fore.RESET)
+            length = len(formatter._format_action_invocation(action)) + indent
+            formatter._action_max_length = max(formatter._action_max_length, length)
+        self._add_header(formatter=formatter, command=command)
+        header = formatter.format_help()
+        if header:
+            yield header + '\n'
+        yield from self._iter_commands(
+            command=command,
+            per_group=per_group,
+            max_length=formatter._action_max_length,
+        )
+        formatter = self._get_formatter()
+        self._add_footer(formatter=formatter)
+        footer = formatter.format_help().strip('\n')
+        if footer:
+            yield '\n' + footer + '\n'
+
+    def write_help(self, stream: IO = None, command: Command = None,
+                   per_group: int = None, pager: Union[bool, str] = None) -> None:
+        """Write help into the stream chunk by chunk as it is rendered.
+
+        If `pager` is True or a command, and the stream is a terminal,
+        the help is piped into the pager (`$PAGER` or `less -R` for True).
+        """
+        if stream is None:
+            stream = self.stream
+        if stream is None:
+            stream = sys.stderr
+        chunks = self.iter_help(command=command, per_group=per_group)
+        self._write_chunks(chunks, stream=stream, pager=pager)
+
+    def _write_chunks(self, chunks: Iterable[str], stream: IO, pager: Union[bool, str] = None) -> None:
+        if pager is None:
+            pager = self.pager
+        if pager and stream.isatty():
+            # subprocess is imported only when the pager is used
+            from ._pager import get_pager_command, page
+
+            page(chunks=chunks, command=get_pager_command(pager))
+            return
+        for chunk in chunks:
+            stream.write(chunk)
+
+    def _print_help(self, command: Command = None, file: IO = None) -> None:
+        if self.help_per_group is not None:
+            self.write_help(stream=file, command=command, per_group=self.help_per_group)
+            return
+
+        key = self._get_help_key(command=command)
+        text = self._get_cached_help(key)
+        if text is None:
+            # the full list of a big registry is streamed to not keep it in memory,
+            # help for a group or guesses is small, so it's rendered and cached
+            filtered = command is not None and command.guesses
+            if self.pager or (not filtered and len(self._handlers) >= self.stream_help_from):
+                self.write_help(stream=file, command=command)
+                return
+            text = self._render_help(command=command)
+            self._helps.put(key, text)
+        if self.pager:
+            if file is None:
+                file = self.stream or sys.stderr
+            self._write_chunks([text], stream=file)
+            return
+        self._print_message(text, file=file)
 
     def _get_formatter(self) -> argparse.HelpFormatter:
         return self.formatter_class(
@@ -174,55 +510,391 @@ class Parser(argparse.ArgumentParser):
             max_help_position=36,
         )
 
-    def _format_commands(self, formatter: argparse.HelpFormatter,
-                         command: Command = None) -> None:
-        prefix = self.prefixes['commands']
+    def _get_commands_prefix(self, command: Command = None) -> str:
         if command:
             if command.group:
-                prefix = self.prefixes['group']
-            elif command.guesses:
-                prefix = self.prefixes['guesses']
-
-        formatter.start_section(Fore.YELLOW + prefix + Fore.RESET)
+                return self.prefixes['group']
+            if command.guesses:
+                return self.prefixes['guesses']
+        return self.prefixes['commands']
+
+    def _iter_command_names(self, command: Command = None) -> Iterator[Tuple[str, bool]]:
+        """Names of commands to show in help with the color flag switched for every group.
+        """
         prev_group = ''
-        colors = {True: Fore.GREEN, False: Fore.BLUE}
         color = True
-        for name, handler in self._handlers.items():
+        for name in list(self._handlers):
             if command and command.guesses and name not in command.guesses:
                 continue
-            # switch colors for every group
-            group, _, subname = name.rpartition(' ')
+            group = name.rpartition(' ')[0]
             if group != prev_group:
                 prev_group = group
                 color = not color
+            yield name, color
 
-            formatter.add_argument(argparse.Action(
-                option_strings=[colors[color] + name + Fore.RESET],
-                dest='',
-                help=handler.summary,
+    def _format_commands(self, formatter: argparse.HelpFormatter,
+                         command: Command = None) -> None:
+        fore = get_fore()
+        prefix = self._get_commands_prefix(command=command)
+        formatter.start_section(fore.YELLOW + prefix + fore.RESET)
+        colors = {True: fore.GREEN, False: fore.BLUE}
+        for name, color in self._iter_command_names(command=command):
+            formatter.add_argument(self._make_command_action(
+                name=colors[color] + name + fore.RESET,
+                summary=self._get_summary(name),
             ))
         formatter.end_section()
 
+    @staticmethod
+    def _make_command_action(name: str, summary: str = None) -> argparse.Action:
+        return argparse.Action(option_strings=[name], dest='', help=summary)
+
+    def _iter_commands(self, command: Command = None, per_group: int = None,
+                       max_length: int = 0) -> Iterator[str]:
+        fore = get_fore()
+        prefix = self._get_commands_prefix(command=command)
+        yield fore.YELLOW + prefix + fore.RESET + ':\n'
+
+        formatter = self._get_formatter()
+        formatter._indent()
+        formatter._action_max_length = max_length
+        indent = formatter._current_indent
+        colors = {True: fore.GREEN, False: fore.BLUE}
+        prev_color = None
+        shown = hidden = 0
+        for name, color in self._iter_command_names(command=command):
+            if color != prev_color:
+                if hidden:
+                    yield '{}... and {} more\n'.format(' ' * indent, hidden)
+                prev_color = color
+                shown = hidden = 0
+            if per_group is not None and shown >= per_group:
+                hidden += 1
+                continue
+            shown += 1
+            yield formatter._format_action(self._make_command_action(
+                name=colors[color] + name + fore.RESET,
+                summary=self._get_summary(name),
+            ))
+        if hidden:
+            yield '{}... and {} more\n'.format(' ' * indent, hidden)
+
     def get_command(self, argv: Sequence[str] = None) -> Optional[CommandHandler]:
         if argv is None:
             argv = sys.argv[1:]
-        command = Command(argv=argv, commands=self._handlers.keys())
+        return self._get_command(command=self._make_command(argv=argv))
+
+    def _make_command(self, argv: Sequence[str]) -> Command:
+        return Command(argv=argv, index=self._index)
+
+    def _get_command(self, command: Command, stdout: IO = None) -> Optional[CommandHandler]:
         if not command.match:
             return None
-        handler = self._handlers[command.match]
-        handler = handler.copy(argv=command.argv)
-        return handler
+        handler = self._resolve_handler(command.match)
+        # None values are ignored by the handler
+        params = dict(argv=command.argv, stream=stdout)
+        parser = self._parsers.get(command.match)
+        if parser is not None:
+            params['parser'] = parser
+        return handler.copy(**params)
+
+    def complete(self, words: Sequence[str]) -> List[str]:
+        """Shell completion candidates for the last word.
+        """
+        return complete(parser=self, words=words)
+
+    def get_completion_script(self, shell: str) -> str:
+        """Completion script for bash, zsh or fish.
+
+        Use it like `eval "$(prog __completion bash)"`.
+        """
+        return get_script(prog=self.prog, shell=shell)
+
+    def serve(self, path: str, preload: bool = True) -> None:
+        """Keep the parser warm behind UNIX socket at the path.
+
+        Every request is handled in a forked process that gets
+        argv, cwd, env and stdio of the client
+        (see `dephell_argparse._client`).
+        With `preload` all lazy commands are imported before serving.
+        Resources used by commands are added into `metrics` of this process.
+        """
+        from ._server import serve
+
+        serve(parser=self, path=path, preload=preload)
+
+    def handle(self, argv: Sequence[str] = None, *,
+               stdout: IO = None, stderr: IO = None) -> int:
+        """Run the command from argv and return the exit code.
+
+        It is safe to call it from many threads at once.
+        Pass `stdout` and `stderr` to get the output of this call only.
+        """
+        if argv is None:
+            argv = sys.argv[1:]
+        return self._run(argv=argv, stdout=stdout, stderr=stderr)
+
+    def handle_many(self, argvs: Iterable[Sequence[str]], fail_fast: bool = False) -> List[int]:
+        """Run commands one by one in this process and return their exit codes.
+
+        Handlers are reused between commands, and built parsers are cached.
+        With `fail_fast` it stops on the first non-zero exit code.
+        """
+        return list(self._iter_handle(argvs=argvs, fail_fast=fail_fast))
+
+    def handle_parallel(self, argvs: Iterable[Sequence[str]], workers: int = None,
+                        factory: Callable[[], 'Parser'] = None,
+                        stdout: IO = None, stderr: IO = None) -> List[int]:
+        """Run commands in a pool of processes and return their exit codes.
+
+        Output of every command is captured in the worker and replayed
+        into stdout and stderr in the order of argvs. Workers are forked
+        and inherit this parser. Where fork isn't available, pass `factory`,
+        a picklable function that makes the parser in every worker.
+        """
+        # multiprocessing is slow to import and required only here
+        from ._pool import handle_parallel
+
+        codes = []
+        results = handle_parallel(parser=self, argvs=argvs, workers=workers, factory=factory)
+        for code, output, errors in results:
+            (stdout or sys.stdout).write(output)
+            (stderr or self.stream or sys.stderr).write(errors)
+            codes.append(code)
+        return codes
+
+    def _iter_handle(self, argvs: Iterable[Sequence[str]], fail_fast: bool = False,
+                     stdout: IO = None, stderr: IO = None) -> Iterator[int]:
+        for argv in argvs:
+            try:
+                code = self._run(argv=argv, stdout=stdout, stderr=stderr)
+            except SystemExit as exc:
+                code = self._get_exit_code(exc, stderr=stderr)
+            yield code
+            if fail_fast and code:
+                return
+
+    def _get_exit_code(self, exc: SystemExit, stderr: IO = None) -> int:
+        """Get the exit code like `exit` does, the message goes into the given stderr.
+        """
+        if exc.code is not None and not isinstance(exc.code, int):
+            self._print_message('{}\n'.format(exc.code), file=stderr)
+        return self._get_exit_status(exc)
+
+    @staticmethod
+    def _get_exit_status(exc: SystemExit) -> int:
+        if exc.code is None:
+            return 0
+        if isinstance(exc.code, int):
+            return exc.code
+        return 1
+
+    def _handle_batch(self, args: Sequence[str], stdout: IO = None, stderr: IO = None) -> int:
+        """Run commands from the file or stdin, one command per line.
+
+        Every line is shell-quoted or JSON list of arguments.
+        Prints exit code for every line and returns the first non-zero one.
+        A line that cannot be parsed gets the `unknown` exit code.
+        """
+        import json
+        import shlex
+
+        fail_fast = '--fail-fast' in args
+        paths = [arg for arg in args if arg != '--fail-fast']
+        if paths and paths[0] != '-':
+            stream = open(paths[0], encoding='utf8')  # type: IO
+        else:
+            stream = sys.stdin
+
+        result = self.codes['ok']
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    argv = json.loads(line) if line.startswith('[') else shlex.split(line)
+                    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                        raise ValueError('expected list of strings')
+                except ValueError as exc:
+                    fore = get_fore()
+                    msg = '{}ERROR:{} cannot parse line: {}\n'
+                    self._print_message(msg.format(fore.RED, fore.RESET, exc), file=stderr)
+                    code = self.codes['unknown']
+                else:
+                    code, = self._iter_handle([argv], stdout=stdout, stderr=stderr)
+                self._print_message('{}\t{}\n'.format(code, line), file=stderr)
+                if code and not result:
+                    result = code
+                if code and fail_fast:
+                    break
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return result
 
-    def handle(self, argv: Sequence[str] = None) -> int:
+    def _run(self, argv: Sequence[str], stdout: IO = None, stderr: IO = None) -> int:
+        with self._profiled(argv=argv) as profile:
+            handler = self._prepare(argv=argv, profile=profile, stdout=stdout, stderr=stderr)
+            if not isinstance(handler, CommandHandler):
+                return self._set_code(profile, code=handler)
+            with self._running(handler=handler, profile=profile):
+                # handlers return anything whatever `__call__` is annotated with
+                result = handler()  # type: Any
+                if is_awaitable(result):
+                    result = run_awaitable(result)
+                result = self._write_result(handler=handler, result=result)
+            return self._set_code(profile, code=self._get_code(result))
+
+    async def _run_async(self, argv: Sequence[str], stdout: IO = None, stderr: IO = None) -> int:
+        with self._profiled(argv=argv) as profile:
+            handler = self._prepare(argv=argv, profile=profile, stdout=stdout, stderr=stderr)
+            if not isinstance(handler, CommandHandler):
+                return self._set_code(profile, code=handler)
+            with self._running(handler=handler, profile=profile):
+                # handlers return anything whatever `__call__` is annotated with
+                result = handler()  # type: Any
+                if is_awaitable(result):
+                    result = await result
+                result = self._write_result(handler=handler, result=result)
+            return self._set_code(profile, code=self._get_code(result))
+
+    @contextmanager
+    def _profiled(self, argv: Sequence[str]) -> Iterator[Optional[Profile]]:
+        """Make the profile of the call if it's needed, and report it when the call is done.
+        """
+        profile = self._make_profile(argv=argv)
+        try:
+            yield profile
+        except SystemExit as exc:
+            if profile is not None:
+                # the caller prints the message, only the code is needed here
+                profile.code = self._get_exit_status(exc)
+            raise
+        finally:
+            if profile is not None:
+                self._report(profile)
+
+    @staticmethod
+    def _set_code(profile: Optional[Profile], code: int) -> int:
+        if profile is not None:
+            # like for `exit`, None is success, and the code of the profile is None only on errors
+            profile.code = 0 if code is None else code
+        return code
+
+    @staticmethod
+    def _write_result(handler: CommandHandler, result: Any) -> Any:
+        records = get_records(result)
+        if records is None:
+            return result
+        write_records(handler=handler, records=records)
+        return True
+
+    def _make_profile(self, argv: Sequence[str]) -> Optional[Profile]:
+        if self.observer is None and self.metrics is None:
+            return None
+        return Profile(argv=argv, usage=self.metrics is not None)
+
+    def _report(self, profile: Profile) -> None:
+        profile.finish()
+        if self.observer is not None:
+            self.observer(profile)
+        if self.metrics is not None:
+            self.metrics.add(profile)
+
+    async def handle_async(self, argv: Sequence[str] = None, *,
+                           stdout: IO = None, stderr: IO = None) -> int:
+        """Handle the command in the running event loop.
+
+        Async handlers are awaited, sync ones are called as is.
+        """
         if argv is None:
             argv = sys.argv[1:]
+        return await self._run_async(argv=argv, stdout=stdout, stderr=stderr)
+
+    async def handle_many_async(self, argvs: Iterable[Sequence[str]], limit: int = 10) -> List[int]:
+        """Run commands concurrently, not more than `limit` at once.
+
+        Returns exit codes in the same order as argvs.
+        """
+        import asyncio
+
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run(argv: Sequence[str]) -> int:
+            async with semaphore:
+                try:
+                    return await self._run_async(argv=argv)
+                except SystemExit as exc:
+                    return self._get_exit_code(exc)
+
+        codes = await asyncio.gather(*[run(argv) for argv in argvs])
+        return list(codes)
+
+    @contextmanager
+    def _running(self, handler: CommandHandler, profile: Optional[Profile]) -> Iterator[None]:
+        if profile is not None:
+            profile.command = handler.name
+            handler.profile = profile
+        try:
+            with phase(profile, 'handler'):
+                try:
+                    yield
+                finally:
+                    handler.flush()
+        finally:
+            # keep built parser for the next calls of the command
+            if 'parser' in vars(handler):
+                self._parsers.put(handler.name, handler.parser)
+
+    def _get_code(self, result) -> int:
+        if type(result) is bool:
+            if result is True:
+                return self.codes['ok']
+            return self.codes['fail']
+        return result
+
+    def _prepare(self, argv: Sequence[str], profile: Profile = None,
+                 stdout: IO = None, stderr: IO = None) -> Union[int, CommandHandler]:
+        """Get handler to run or handle argv without it and return exit code.
+        """
+        # hidden commands for shell completion
+        if argv and argv[0] == '__complete':
+            for candidate in self.complete(words=argv[1:]):
+                print(candidate, file=stdout)
+            return self.codes['ok']
+        if len(argv) == 2 and argv[0] == '__completion':
+            try:
+                script = self.get_completion_script(shell=argv[1])
+            except ValueError as exc:
+                fore = get_fore()
+                self._print_message('{}ERROR:{} {}\n'.format(fore.RED, fore.RESET, exc), file=stderr)
+                return self.codes['unknown']
+            print(script, end='', file=stdout)
+            return self.codes['ok']
+
+        output_format = None
+        if argv and argv[0].startswith('--format'):
+            output_format, argv = self._split_format(argv)
+            if output_format not in FORMATS:
+                msg = '{}ERROR:{} unknown format {!r}, use one of: {}\n'
+                fore = get_fore()
+                self._print_message(msg.format(
+                    fore.RED, fore.RESET, output_format, ', '.join(FORMATS),
+                ), file=stderr)
+                return self.codes['unknown']
+
+        if argv and argv[0] == '--debug-imports':
+            return self._debug_imports(argv[1:], stdout=stdout, stderr=stderr)
+        if argv and argv[0] == '--batch':
+            return self._handle_batch(argv[1:], stdout=stdout, stderr=stderr)
 
         # print help
         if not argv:
-            self._print_message(self.format_help())
+            self._print_help(file=stderr)
             return self.codes['help']
         if len(argv) == 1 and argv[0] in ('--help', 'help', 'commands'):
-            self._print_message(self.format_help())
+            self._print_help(file=stderr)
             return self.codes['help']
 
         # rewrite argv to get help about command
@@ -230,16 +902,25 @@ class Parser(argparse.ArgumentParser):
             argv = list(argv[1:]) + ['--help']
 
         # get command
-        handler = self.get_command(argv=argv)
+        with phase(profile, 'resolve'):
+            command = self._make_command(argv=argv)
+            handler = self._get_command(command=command, stdout=stdout)
         if not handler:
-            command = Command(argv=argv, commands=self._handlers.keys())
-            self._print_message(self.format_help(command=command))
+            self._print_help(command=command, file=stderr)
             return self.codes['unknown']
 
-        # run command
-        result = handler()
-        if type(result) is bool:
-            if result is True:
-                return self.codes['ok']
-            return self.codes['fail']
-        return result
+        handler.output_format = output_format
+        return handler
+
+    @staticmethod
+    def _split_format(argv: Sequence[str]) -> Tuple[Optional[str], Sequence[str]]:
+        """Get value of the global `--format` option and the rest of argv.
+        """
+        if argv[0] == '--format':
+            if len(argv) < 2:
+                return '', argv[1:]
+            return argv[1], argv[2:]
+        prefix, sep, value = argv[0].partition('=')
+        if prefix != '--format' or not sep:
+            return '', argv
+        return value, argv[1:]
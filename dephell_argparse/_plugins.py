@@ -0,0 +1,133 @@
+# built-in
+import os
+import sys
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Tuple
+
+# app
+from ._files import write_atomic
+
+
+logger = getLogger('dephell_argparse')
+
+# bump it on every incompatible change of the cache format
+PLUGINS_FORMAT = 1
+
+
+def _has_distributions(path: str) -> bool:
+    try:
+        with os.scandir(path) as entries:
+            return any(entry.name.endswith(('.dist-info', '.egg-info')) for entry in entries)
+    except OSError:
+        return False
+
+
+def get_fingerprint() -> List[Tuple[str, int]]:
+    """Modification times of all paths where distributions are installed.
+
+    Installing, upgrading or removing a distribution adds or removes
+    its metadata directory, so the modification time of the directory changes.
+    It's much cheaper than reading metadata of all distributions.
+    Paths without distributions, like the current or the script directory,
+    are skipped, because any file created there changes their modification time.
+    """
+    fingerprint = []
+    for path in sys.path:
+        if not path or not _has_distributions(path):
+            continue
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        fingerprint.append((path, mtime))
+    return fingerprint
+
+
+def get_cache_path(group: str) -> str:
+    import zlib
+
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    # every environment has its own cache
+    env = zlib.crc32(sys.prefix.encode('utf8'))
+    return os.path.join(root, 'dephell_argparse', 'plugins-{}-{:08x}.json'.format(group, env))
+
+
+def discover(group: str) -> List[Tuple[str, str]]:
+    """Names and import paths of all entry points in the group.
+    """
+    if sys.version_info >= (3, 8):
+        from importlib.metadata import entry_points
+    else:
+        # backport for old pythons, required by the package for them
+        from importlib_metadata import entry_points
+
+    found = entry_points()
+    if hasattr(found, 'select'):
+        selected = found.select(group=group)
+    else:
+        selected = found.get(group, ())
+
+    plugins = []
+    names = set()
+    for entry_point in selected:
+        # the same distribution can be found on many paths, the first one wins
+        if entry_point.name in names:
+            continue
+        names.add(entry_point.name)
+        # drop extras: `package.module:Command [extra]`
+        path = entry_point.value.partition('[')[0].strip()
+        plugins.append((entry_point.name, path))
+    return plugins
+
+
+def read_cache(path: str, group: str, fingerprint: List[Tuple[str, int]]) -> Optional[List[Tuple[str, str]]]:
+    """Read discovered plugins from the disk. Returns None if the cache is missed, broken or stale.
+    """
+    import json
+
+    try:
+        with open(path, encoding='utf8') as stream:
+            cache = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict):
+        return None
+    if cache.get('format') != PLUGINS_FORMAT or cache.get('group') != group:
+        return None
+    if cache.get('fingerprint') != [list(item) for item in fingerprint]:
+        return None
+    return [tuple(plugin) for plugin in cache['plugins']]
+
+
+def dump_cache(path: str, group: str, fingerprint: List[Tuple[str, int]],
+               plugins: List[Tuple[str, str]]) -> None:
+    import json
+
+    cache = dict(
+        format=PLUGINS_FORMAT,
+        group=group,
+        fingerprint=fingerprint,
+        plugins=plugins,
+    )  # type: Dict[str, Any]
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, json.dumps(cache, sort_keys=True))
+    except OSError as exc:
+        # the cache is only an optimization
+        logger.debug('cannot save plugins cache', extra=dict(path=path, exc=exc))
+
+
+def get_plugins(group: str, cache_path: Optional[str] = None,
+                use_cache: bool = True) -> List[Tuple[str, str]]:
+    """Discovered plugins, from the cache if nothing has been installed since.
+    """
+    if not use_cache:
+        return discover(group=group)
+    if cache_path is None:
+        cache_path = get_cache_path(group=group)
+    fingerprint = get_fingerprint()
+    plugins = read_cache(path=cache_path, group=group, fingerprint=fingerprint)
+    if plugins is None:
+        plugins = discover(group=group)
+        dump_cache(path=cache_path, group=group, fingerprint=fingerprint, plugins=plugins)
+    return plugins
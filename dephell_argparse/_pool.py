@@ -0,0 +1,59 @@
+# built-in
+import multiprocessing
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+if TYPE_CHECKING:
+    # app
+    from ._parser import Parser
+
+
+# the parser in the worker process, it's set only in workers
+_parser = None  # type: Optional[Parser]
+
+
+def _init_worker(parser: Optional['Parser'], factory: Optional[Callable[[], 'Parser']]) -> None:
+    global _parser
+    _parser = factory() if factory is not None else parser
+
+
+def _run_in_worker(argv: Sequence[str]) -> Tuple[int, str, str]:
+    """Resolve and run the command in the worker, capturing all the output.
+    """
+    stdout = StringIO()
+    stderr = StringIO()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        parser = _parser
+        assert parser is not None, 'the worker is not initialized'
+        try:
+            code = parser._run(argv=argv, stdout=stdout, stderr=stderr)
+        except SystemExit as exc:
+            code = parser._get_exit_code(exc, stderr=stderr)
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def handle_parallel(parser: 'Parser', argvs: Iterable[Sequence[str]], workers: int = None,
+                    factory: Callable[[], 'Parser'] = None) -> Iterator[Tuple[int, str, str]]:
+    """Run commands in a pool of processes, yield exit code, stdout and stderr in order.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if factory is None:
+        if 'fork' not in methods:
+            raise ValueError('factory is required on platforms without fork')
+        context = multiprocessing.get_context('fork')
+        # initargs aren't pickled on fork, workers get the parser as is
+        initargs = (parser, None)  # type: Tuple[Optional[Parser], Optional[Callable[[], Parser]]]
+    else:
+        context = multiprocessing.get_context()
+        initargs = (None, factory)
+
+    pool = context.Pool(processes=workers, initializer=_init_worker, initargs=initargs)
+    try:
+        for result in pool.imap(_run_in_worker, [list(argv) for argv in argvs]):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,183 @@
+# built-in
+import os
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+from time import perf_counter, process_time
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence
+
+
+PROFILE_ENV = 'DEPHELL_ARGPARSE_PROFILE'
+
+Phase = namedtuple('Phase', ['name', 'wall', 'cpu'])
+# resources used by one invocation: seconds, and bytes for memory
+Usage = namedtuple('Usage', ['wall', 'user', 'sys', 'maxrss', 'memory'])
+
+
+def _get_tracemalloc():
+    # if memory is traced, tracemalloc is already imported, don't import it for nothing
+    module = sys.modules.get('tracemalloc')
+    if module is None or not module.is_tracing():
+        return None
+    return module
+
+
+def get_usage() -> Usage:
+    """Wall time, CPU user and system time, and max RSS of the process so far.
+
+    Memory is the current size of memory blocks traced by tracemalloc, if it's tracing.
+    """
+    tracemalloc = _get_tracemalloc()
+    memory = tracemalloc.get_traced_memory()[0] if tracemalloc else 0
+    try:
+        import resource
+    except ImportError:
+        # there is no resource module on Windows
+        times = os.times()
+        return Usage(perf_counter(), times.user, times.system, 0, memory)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # kilobytes on Linux, bytes on macOS
+    maxrss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return Usage(perf_counter(), usage.ru_utime, usage.ru_stime, maxrss, memory)
+
+
+class _Noop:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NOOP = _Noop()
+
+
+class Profile:
+    """Wall and CPU time of every phase of one `Parser.handle` invocation.
+
+    Phases are `resolve` (finding and importing the command), `parser` (building it),
+    `parse_args` and `handler`. Time of nested phases isn't included
+    into the outer ones, so `handler` doesn't count parsing of arguments.
+    With `usage` resources used by the whole invocation are measured as well,
+    see `finish`.
+    """
+
+    def __init__(self, argv: Sequence[str], usage: bool = False):
+        self.argv = tuple(argv)
+        self.command = None  # type: Optional[str]
+        self.code = None  # type: Optional[int]
+        self.phases = []  # type: List[Phase]
+        self.usage = None  # type: Optional[Usage]
+        self._nested = []  # type: List[List[float]]
+        self._start = None  # type: Optional[Usage]
+        if usage:
+            tracemalloc = _get_tracemalloc()
+            if tracemalloc and hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self._start = get_usage()
+
+    def finish(self) -> None:
+        """Calculate resources used since the profile was made, if requested.
+
+        Memory is the peak of traced memory over the memory traced at start.
+        CPU time and RSS are of the whole process, so they count
+        other threads if commands are handled concurrently.
+        """
+        if self._start is None:
+            return
+        end = get_usage()
+        memory = 0
+        tracemalloc = _get_tracemalloc()
+        if tracemalloc:
+            memory = max(tracemalloc.get_traced_memory()[1] - self._start.memory, 0)
+        self.usage = Usage(
+            wall=end.wall - self._start.wall,
+            user=end.user - self._start.user,
+            sys=end.sys - self._start.sys,
+            maxrss=end.maxrss - self._start.maxrss,
+            memory=memory,
+        )
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._nested.append([0.0, 0.0])
+        wall = perf_counter()
+        cpu = process_time()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - wall
+            cpu = process_time() - cpu
+            nested_wall, nested_cpu = self._nested.pop()
+            if self._nested:
+                self._nested[-1][0] += wall
+                self._nested[-1][1] += cpu
+            self.phases.append(Phase(name, wall - nested_wall, cpu - nested_cpu))
+
+    @property
+    def wall(self) -> float:
+        return sum(phase.wall for phase in self.phases)
+
+    @property
+    def cpu(self) -> float:
+        return sum(phase.cpu for phase in self.phases)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            argv=list(self.argv),
+            command=self.command,
+            code=self.code,
+            wall=self.wall,
+            cpu=self.cpu,
+            phases=[phase._asdict() for phase in self.phases],
+            usage=None if self.usage is None else self.usage._asdict(),
+        )
+
+
+def phase(profile: Optional[Profile], name: str):
+    """Measure the phase if profiling is enabled, do nothing otherwise.
+    """
+    if profile is None:
+        return _NOOP
+    return profile.phase(name)
+
+
+class TextReporter:
+    """Print timings breakdown for every invocation.
+    """
+
+    def __init__(self, stream: IO = None):
+        self.stream = stream
+
+    def __call__(self, profile: Profile) -> None:
+        lines = ['profile: {} (exit code {})'.format(profile.command or '<no command>', profile.code)]
+        line = '  {:<12} {:>10.3f} ms wall {:>10.3f} ms cpu'
+        for item in profile.phases:
+            lines.append(line.format(item.name, item.wall * 1000, item.cpu * 1000))
+        lines.append(line.format('total', profile.wall * 1000, profile.cpu * 1000))
+        print(*lines, sep='\n', file=self.stream or sys.stderr)
+
+
+class JSONReporter:
+    """Write timings of every invocation as a JSON line.
+    """
+
+    def __init__(self, stream: IO = None):
+        self.stream = stream
+
+    def __call__(self, profile: Profile) -> None:
+        import json
+
+        stream = self.stream or sys.stderr
+        stream.write(json.dumps(profile.as_dict(), sort_keys=True) + '\n')
+        stream.flush()
+
+
+def get_reporter(value: Optional[str]):
+    """Reporter for the value of `DEPHELL_ARGPARSE_PROFILE` env var.
+    """
+    if not value or value == '0':
+        return None
+    if value == 'json':
+        return JSONReporter()
+    return TextReporter()
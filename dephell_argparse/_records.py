@@ -0,0 +1,134 @@
+# built-in
+from functools import partial
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+if TYPE_CHECKING:
+    # app
+    from ._handler import CommandHandler
+
+
+DEFAULT_FORMAT = 'jsonl'
+
+
+# marker of an empty iterable, it can't be returned by anything else
+_EMPTY = object()
+
+
+def _is_dataclass(value: Any) -> bool:
+    # dataclasses module isn't imported until a dataclass is returned
+    return hasattr(type(value), '__dataclass_fields__')
+
+
+def _is_record(value: Any) -> bool:
+    return isinstance(value, (dict, tuple)) or _is_dataclass(value)
+
+
+def get_records(value: Any) -> Optional[Iterable[Any]]:
+    """Records from the handler result, or None if it's an exit code or anything else.
+
+    An iterable is records only if its first item is a record, so lists of strings
+    or numbers are returned from the handler as is. An iterator cannot be returned
+    as is after its first item is taken, so TypeError is raised for it instead.
+    """
+    if value is None or isinstance(value, (bool, int, str, bytes)):
+        return None
+    if _is_record(value):
+        return (value, )
+    if not hasattr(value, '__iter__'):
+        return None
+    iterator = iter(value)
+    first = next(iterator, _EMPTY)
+    if first is _EMPTY:
+        return ()
+    if _is_record(first):
+        if iterator is value:
+            return chain((first, ), iterator)
+        return value
+    if iterator is value:
+        msg = 'handler returned iterator of {} instead of records (dicts, tuples or dataclasses)'
+        raise TypeError(msg.format(type(first).__name__))
+    return None
+
+
+def get_fields(record: Any) -> Optional[Sequence[str]]:
+    """Names of the record fields, None for plain tuples.
+    """
+    if isinstance(record, dict):
+        return list(record)
+    if _is_dataclass(record):
+        from dataclasses import fields
+        return [field.name for field in fields(record)]
+    # namedtuple
+    return getattr(record, '_fields', None)
+
+
+def get_values(record: Any, fields: Optional[Sequence[str]]) -> List[Any]:
+    if isinstance(record, dict):
+        return [record.get(field) for field in fields or ()]
+    if _is_dataclass(record):
+        return [getattr(record, field) for field in fields or ()]
+    return list(record)
+
+
+def to_json(record: Any) -> Any:
+    if isinstance(record, dict):
+        return record
+    if _is_dataclass(record):
+        from dataclasses import asdict
+        return asdict(record)
+    if hasattr(record, '_asdict'):
+        return record._asdict()
+    return list(record)
+
+
+def format_jsonl(records: Iterable[Any]) -> Iterator[str]:
+    import json
+
+    encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    for record in records:
+        yield encode(to_json(record))
+
+
+class _Row:
+    """File-like object to get the row from `csv.writer` back.
+    """
+
+    def __init__(self):
+        self.text = ''
+
+    def write(self, text: str) -> None:
+        self.text = text
+
+
+def format_csv(records: Iterable[Any], delimiter: str = ',') -> Iterator[str]:
+    """Rows of CSV, with the header if the records have named fields.
+    """
+    import csv
+
+    row = _Row()
+    writer = csv.writer(row, delimiter=delimiter, lineterminator='\n')
+    fields = None
+    for index, record in enumerate(records):
+        if index == 0:
+            fields = get_fields(record)
+            if fields:
+                writer.writerow(fields)
+                yield row.text[:-1]
+        writer.writerow(get_values(record, fields))
+        yield row.text[:-1]
+
+
+FORMATS = dict(
+    jsonl=format_jsonl,
+    csv=format_csv,
+    tsv=partial(format_csv, delimiter='\t'),
+)  # type: Dict[str, Callable[[Iterable[Any]], Iterator[str]]]
+
+
+def write_records(handler: 'CommandHandler', records: Iterable[Any]) -> None:
+    """Write records lazily into the handler's stream in the requested format.
+    """
+    formatter = FORMATS[handler.output_format or DEFAULT_FORMAT]
+    handler.write_lines(formatter(records))
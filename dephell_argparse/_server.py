@@ -0,0 +1,175 @@
+# built-in
+import array
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import traceback
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+# app
+from ._client import INT
+from ._metrics import Metrics
+from ._profile import Profile, Usage
+
+
+if TYPE_CHECKING:
+    # app
+    from ._parser import Parser
+
+
+# stdin, stdout and stderr of the client
+_FDS_COUNT = 3
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = conn.recv(size)
+        if not chunk:
+            raise ConnectionError('connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_request(conn: socket.socket) -> Tuple[Dict[str, Any], List[int]]:
+    fds = array.array('i')
+    size = socket.CMSG_LEN(_FDS_COUNT * fds.itemsize)
+    head, ancdata, _flags, _addr = conn.recvmsg(INT.size, size)
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+    if len(head) < INT.size:
+        head += _recv_exactly(conn, INT.size - len(head))
+    length, = INT.unpack(head)
+    request = json.loads(_recv_exactly(conn, length).decode('utf8'))
+    return request, list(fds)
+
+
+def _run_request(parser: 'Parser', conn: socket.socket) -> None:
+    """Run the command from the request in the forked process.
+    """
+    request, fds = recv_request(conn)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    # become the client: all streams write into the client's terminal or pipes
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+
+    try:
+        result = parser.handle(request['argv'])
+    except SystemExit as exc:
+        result = exc.code
+    except Exception:
+        traceback.print_exc()
+        result = 1
+    # handlers can return None or anything else, use the same rules as `exit`
+    code = parser._get_exit_code(SystemExit(result), stderr=sys.stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall(INT.pack(code))
+
+
+class _MetricsSender(Metrics):
+    """Sends resources used by the command from the forked process to the server.
+
+    It replaces `Parser.metrics` in the child, the server aggregates them.
+    """
+
+    def __init__(self, conn: socket.socket):
+        super().__init__()
+        self.conn = conn
+
+    def add(self, profile: Profile) -> None:
+        if profile.command is None or profile.usage is None:
+            return
+        message = dict(command=profile.command, code=profile.code, usage=profile.usage._asdict())
+        # datagrams are never mixed, even if sent by many children at once
+        self.conn.send(json.dumps(message).encode('utf8'))
+
+
+def _recv_metrics(conn: socket.socket, metrics: Metrics) -> None:
+    while True:
+        try:
+            data = conn.recv(64 * 1024)
+        except BlockingIOError:
+            return
+        message = json.loads(data.decode('utf8'))
+        profile = Profile(argv=())
+        profile.command = message['command']
+        profile.code = message['code']
+        profile.usage = Usage(**message['usage'])
+        metrics.add(profile)
+
+
+def serve(parser: 'Parser', path: str, preload: bool = True) -> None:
+    """Keep the parser warm behind UNIX socket and run every request in a fork.
+
+    If the parser has metrics, children send them back, so they are collected
+    in the server process.
+    """
+    if preload:
+        for name in list(parser._handlers):
+            parser._resolve_handler(name)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(128)
+    # children are reaped by the kernel, restored on exit for subprocess to get exit codes
+    sigchld = signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    metrics = parser.metrics
+    if metrics is not None:
+        # children send resources used by commands back to be aggregated here
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        reader.setblocking(False)
+        selector.register(reader, selectors.EVENT_READ, data=metrics)
+
+    try:
+        while True:
+            for key, _events in selector.select():
+                if key.fileobj is not server:
+                    _recv_metrics(conn=reader, metrics=key.data)
+                    continue
+                conn, _ = server.accept()
+                # don't let the child to write buffered output once more
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if os.fork() != 0:
+                    conn.close()
+                    continue
+
+                # child
+                code = 0
+                try:
+                    selector.close()
+                    server.close()
+                    if metrics is not None:
+                        reader.close()
+                        parser.metrics = _MetricsSender(writer)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    _run_request(parser=parser, conn=conn)
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+                finally:
+                    os._exit(code)
+    finally:
+        if sigchld is not None:
+            signal.signal(signal.SIGCHLD, sigchld)
+        selector.close()
+        server.close()
+        if metrics is not None:
+            reader.close()
+            writer.close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,60 @@
+# built-in
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+class WordTrie:
+    """Trie over words of command names.
+
+    Every node is a words prefix of some names. The node has `name`
+    if the prefix is a name itself, and `children` if it is a group.
+    Leafs don't have a dict of children to keep them compact.
+    """
+    __slots__ = ('children', 'name')
+
+    def __init__(self):
+        self.children = None  # type: Optional[Dict[str, WordTrie]]
+        self.name = None  # type: Optional[str]
+
+    def add(self, words: Iterable[str], name: str) -> None:
+        node = self
+        for word in words:
+            if node.children is None:
+                node.children = dict()
+            child = node.children.get(word)
+            if child is None:
+                child = node.children[word] = WordTrie()
+            node = child
+        node.name = name
+
+    def walk(self, words: Iterable[str]) -> Iterator[Tuple[int, 'WordTrie']]:
+        """Nodes on the path of the given words with the depth of every node.
+        """
+        node = self
+        for depth, word in enumerate(words, start=1):
+            if not node.children:
+                return
+            node = node.children.get(word)
+            if node is None:
+                return
+            yield depth, node
+
+    def find(self, words: Iterable[str]) -> Optional['WordTrie']:
+        node = self
+        for word in words:
+            if not node.children:
+                return None
+            node = node.children.get(word)
+            if node is None:
+                return None
+        return node
+
+    def __iter__(self) -> Iterator[str]:
+        """Names in the subtree, parents first, in order of adding.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.name is not None:
+                yield node.name
+            if node.children:
+                stack.extend(reversed(list(node.children.values())))
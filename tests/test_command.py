@@ -1,8 +1,13 @@
+# built-in
+from random import Random
+
 # external
 import pytest
 
 # project
 from dephell_argparse._command import Command
+from dephell_argparse._fuzzy import FuzzyIndex
+from dephell_argparse._index import CommandsIndex
 
 
 def test_groups():
@@ -64,3 +69,100 @@ TEST_COMMANDS = (
 def test_match(argv, match):
     cmd = Command(argv=argv, commands=TEST_COMMANDS)
     assert cmd.match == match
+
+
+DEEP_COMMANDS = (
+    'cloud db backup create',
+    'cloud db backup list',
+    'cloud db restore',
+    'cloud vm start',
+)
+
+
+@pytest.mark.parametrize('argv, match, group', [
+    (['cloud', 'db', 'backup', 'create'], 'cloud db backup create', 'cloud db backup'),
+    (['cloud', 'db', 'backup', 'list', '--all'], 'cloud db backup list', 'cloud db backup'),
+    (['cloud', 'db', 'restore', 'backup'], 'cloud db restore', 'cloud db'),
+    (['cloud', 'db', 'backup', 'craete'], 'cloud db backup create', 'cloud db backup'),
+    (['cloud', 'db', 'nope'], None, 'cloud db'),
+    (['cloud'], None, 'cloud'),
+    (['restore'], 'cloud db restore', None),
+    (['vm', 'cloud'], 'cloud vm start', None),
+])
+def test_match_deep(argv, match, group):
+    cmd = Command(argv=argv, commands=DEEP_COMMANDS)
+    assert cmd.match == match
+    assert cmd.group == group
+
+
+@pytest.mark.parametrize('argv, words', [
+    (['cloud', 'db', 'restore', 'prod', '--force'], 3),
+    (['restore', 'prod', '--force'], 1),
+    (['vm', 'fast'], 1),
+    (['cloud', 'db', 'backup', 'craete', 'daily'], 4),
+    (['cloud', 'db', 'restroe', 'prod'], 3),
+    (['nope', 'prod'], 0),
+])
+def test_words_deep(argv, words):
+    cmd = Command(argv=argv, commands=DEEP_COMMANDS)
+    assert cmd.words == words
+    assert cmd.argv == tuple(argv[words:])
+
+
+def test_groups_deep():
+    cmd = Command(argv=['cloud', 'db'], commands=DEEP_COMMANDS)
+    assert cmd.groups == {'cloud', 'cloud db', 'cloud db backup', 'cloud vm'}
+    assert cmd.suggestions == ('cloud db backup create', 'cloud db backup list', 'cloud db restore')
+    assert cmd.index.next_words(['cloud', 'db']) == ['backup', 'restore']
+
+
+def test_shortcuts():
+    index = CommandsIndex(TEST_COMMANDS)
+    assert index.shortcuts['prod math'] == 'math prod'
+    assert index.shortcuts['prod'] == 'math prod'
+    # ambiguous
+    assert index.shortcuts['there'] is None
+    assert Command(argv=['prod', 'math'], index=index).match == 'math prod'
+    assert Command(argv=['prod', 'math', '1'], index=index).argv == ('1', )
+    assert Command(argv=['prod', '1', '2'], index=index).argv == ('1', '2')
+
+
+def test_shared_index():
+    index = CommandsIndex()
+    assert Command(argv=['math', 'sum'], index=index).match is None
+
+    index.add('math sum')
+    index.add('Http Get')
+    assert Command(argv=['math', 'sum'], index=index).match == 'math sum'
+    assert Command(argv=['http', 'get'], index=index).match == 'Http Get'
+    assert Command(argv=['math'], index=index).group == 'math'
+    assert Command(argv=['math'], index=index).guesses == {'math sum'}
+
+
+@pytest.mark.parametrize('word', ['twilight', 'twiligth', 'twiight', 'twillight', 'sparkle', 'ghttw', ''])
+@pytest.mark.parametrize('threshold', [0, 1, 2, 3])
+def test_fuzzy_index_consistent(word, threshold):
+    words = ('twilight', 'sparkle', 'twilightt', 'light', 'twi')
+    index = FuzzyIndex(words)
+    expected = {w for w in words if Command._similar(word, w, threshold=threshold)}
+    assert set(index.search(word, threshold=threshold)) == expected
+
+
+@pytest.mark.parametrize('threshold', [2, 3, 4])
+def test_fuzzy_index_walk(threshold):
+    rnd = Random(threshold)
+    words = [''.join(rnd.choice('abcde ') for _ in range(rnd.randint(1, 8))) for _ in range(300)]
+    index = FuzzyIndex()
+    # signatures are kept sorted when words are added one by one
+    for word in words:
+        index.add(word)
+    for word in words[:50] + ['', 'eeeeeeeeee', 'xyz']:
+        expected = {w for w in words if Command._similar(word, w, threshold=threshold)}
+        assert set(index.search(word, threshold=threshold)) == expected
+
+
+def test_fuzzy_index_ranked():
+    index = FuzzyIndex(['math prod', 'math sum', 'math sun', 'math'])
+    assert index.search('math sum', threshold=3) == ['math sum', 'math sun']
+    assert index.search('math sum', threshold=3, limit=1) == ['math sum']
+    assert index.search('math snu', threshold=1) == ['math sun']
@@ -1,3 +1,9 @@
+# built-in
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from threading import Barrier
+
 # external
 import pytest
 
@@ -51,3 +57,60 @@ def test_description():
         """
 
     assert CommandHandler(handler=Handler()).description == 'test me!'
+
+
+def test_write_lines():
+    stream = StringIO()
+    handler = CommandHandler(stream=stream, buffer_size=10)
+    handler.write_lines(['one', 'two'])
+    assert stream.getvalue() == ''
+    handler.write_lines(['three'])
+    assert stream.getvalue() == 'one\ntwo\nthree\n'
+    handler.write_lines(['four'])
+    handler.print('five')
+    assert stream.getvalue() == 'one\ntwo\nthree\nfour\nfive\n'
+    handler.write_lines(['six'], end='\t')
+    handler.flush()
+    assert stream.getvalue().endswith('five\nsix\t')
+
+
+def test_write_lines_bytes(tmp_path, monkeypatch):
+    path = tmp_path / 'out.txt'
+    with path.open('w', encoding='utf8') as stream:
+        # lines are written as bytes only into the standard streams
+        monkeypatch.setattr(sys, '__stdout__', stream)
+        handler = CommandHandler(stream=stream)
+        stream.write('first\n')
+        handler.write_lines(['второй', 'third'])
+        handler.flush()
+        stream.write('last\n')
+    assert path.read_text(encoding='utf8') == 'first\nвторой\nthird\nlast\n'
+
+
+def test_write_lines_newline(tmp_path):
+    path = tmp_path / 'out.txt'
+    with path.open('w', encoding='utf8', newline='\r\n') as stream:
+        handler = CommandHandler(stream=stream)
+        handler.print('a')
+        handler.write_lines(['b', 'c'])
+        handler.flush()
+    assert path.read_bytes() == b'a\r\nb\r\nc\r\n'
+
+
+def test_cached_property_per_instance_lock():
+    # every description waits for the other one, so it'd hang with a shared lock
+    barrier = Barrier(2, timeout=5)
+    calls = []
+
+    class SlowCommand(CommandHandler):
+        def _get_docstring(self) -> str:
+            calls.append(self.name)
+            barrier.wait()
+            return self.name
+
+    handlers = [SlowCommand(name='one'), SlowCommand(name='two')]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        descriptions = list(executor.map(lambda handler: handler.description, handlers * 2))
+    assert descriptions == ['one', 'two', 'one', 'two']
+    assert sorted(calls) == ['one', 'two']
+    assert not CommandHandler.__dict__['description'].locks
@@ -0,0 +1,71 @@
+# built-in
+import os
+import subprocess
+import sys
+from typing import Dict, Sequence
+
+
+# How many times the package may be slower to import than argparse.
+# Both are imported in one process, argparse goes first, so the package
+# is measured without it, and the noise of the machine affects both. It's about 2 now.
+IMPORT_RATIO = 3
+# the best of so many runs is compared
+IMPORT_RUNS = 5
+
+# modules that are slow to import and required only for some features
+LAZY_MODULES = (
+    'colorama',
+    'inspect',
+    'json',
+    'multiprocessing',
+    'pip',
+    'shlex',
+    'socket',
+    'subprocess',
+    'tracemalloc',
+)
+
+
+def _import(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    # without bytecode cache the time of compiling would be measured
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code + '; import sys; print(*sys.modules)'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+        env=env,
+    )
+    return result
+
+
+def _get_import_times(code: str, names: Sequence[str]) -> Dict[str, int]:
+    """The best cumulative import time of every module in microseconds.
+    """
+    # the first run writes bytecode cache
+    _import(code)
+    timings = dict()  # type: Dict[str, int]
+    for _ in range(IMPORT_RUNS):
+        # lines look like `import time: self [us] | cumulative | imported package`
+        for line in _import(code).stderr.splitlines():
+            _, cumulative, name = line.split('|')
+            name = name.strip()
+            if name in names:
+                timings[name] = min(timings.get(name, int(cumulative)), int(cumulative))
+    assert set(timings) == set(names), 'import is not reported'
+    return timings
+
+
+def test_import_time():
+    code = 'import argparse; import dephell_argparse'
+    timings = _get_import_times(code, names=('argparse', 'dephell_argparse'))
+    assert timings['dephell_argparse'] < timings['argparse'] * IMPORT_RATIO
+
+
+def test_lazy_imports():
+    modules = set(_import('import dephell_argparse').stdout.split())
+    assert 'dephell_argparse' in modules
+    for name in LAZY_MODULES:
+        assert name not in modules
@@ -1,8 +1,20 @@
 # built-in
+import asyncio
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
+from io import StringIO
+from pathlib import Path
+
+# external
+import pytest
 
 # project
-from dephell_argparse import CommandHandler, Parser
+from dephell_argparse import CommandHandler, JSONReporter, Metrics, Parser, TextReporter
 
 
 parser = Parser()
@@ -52,3 +64,839 @@ def test_handle():
     assert parser.handle(argv=['math']) == 1
     assert parser.handle(argv=['ping']) == 14
     assert parser.handle(argv=['math', 'sum', '1', '2']) == 15
+
+
+def test_format_help_does_not_build_parsers():
+    calls = []
+
+    class HelloCommand(CommandHandler):
+        """Say hello
+        """
+        @staticmethod
+        def build_parser(parser: Parser) -> Parser:
+            calls.append(parser)
+            return parser
+
+    class ByeCommand(HelloCommand):
+        summary = 'Say bye'
+
+    local_parser = Parser()
+    local_parser.add_command(HelloCommand)
+    local_parser.add_command(ByeCommand)
+    help = local_parser.format_help()
+    assert 'Say hello' in help
+    assert 'Say bye' in help
+    assert calls == []
+
+    handler = local_parser.get_command(['hello'])
+    assert handler is not None
+    handler.args
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def lazy_module(tmp_path, monkeypatch):
+    path = tmp_path / 'lazy_commands.py'
+    path.write_text(
+        'from dephell_argparse import CommandHandler\n'
+        'class SyncCommand(CommandHandler):\n'
+        '    """Sync everything\n    """\n'
+        '    @staticmethod\n'
+        '    def build_parser(parser):\n'
+        '        parser.add_argument("--force", action="store_true")\n'
+        '        return parser\n'
+        '    def __call__(self):\n'
+        '        return 17\n'
+        'def lazy_hello(args):\n'
+        '    """Say hello\n    """\n'
+        '    return 18\n',
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_commands', raising=False)
+    return path
+
+
+def test_lazy_command(lazy_module):
+    local_parser = Parser()
+    local_parser.add_command('lazy_commands:SyncCommand', summary='Sync all')
+    local_parser.add_command('lazy_commands:lazy_hello', name='hello')
+    assert 'lazy_commands' not in sys.modules
+    assert local_parser.get_command(['sync']) is not None
+    assert 'lazy_commands' in sys.modules
+    assert local_parser.handle(['sync']) == 17
+    assert local_parser.handle(['hello']) == 18
+    assert 'Say hello' in local_parser.format_help()
+
+
+def test_shortcut_keeps_arguments():
+    subparser = Parser()
+    subparser.add_argument('target')
+    subparser.add_argument('--force', action='store_true')
+    calls = []
+    local_parser = Parser()
+    local_parser.add_command(lambda args: calls.append(vars(args)) or 0, name='cloud db restore', parser=subparser)
+    assert local_parser.handle(['restore', 'prod', '--force']) == 0
+    assert local_parser.handle(['cloud', 'db', 'restore', 'prod']) == 0
+    assert calls == [dict(target='prod', force=True), dict(target='prod', force=False)]
+
+
+def test_lazy_command_summary_without_import(monkeypatch):
+    local_parser = Parser()
+    local_parser.add_command('not_existing_module:SyncCommand', summary='Sync all')
+    assert 'Sync all' in local_parser.format_help()
+    with pytest.raises(ImportError):
+        local_parser.handle(['sync'])
+
+
+def test_manifest(lazy_module, tmp_path, monkeypatch):
+    manifest_path = str(tmp_path / 'manifest.json')
+    local_parser = Parser()
+    assert not local_parser.load_manifest(manifest_path)
+    local_parser.add_command('lazy_commands:SyncCommand')
+    local_parser.add_command('lazy_commands:lazy_hello', name='hello')
+    local_parser.dump_manifest(manifest_path, version='1.0')
+
+    monkeypatch.delitem(sys.modules, 'lazy_commands')
+    local_parser = Parser()
+    assert not local_parser.load_manifest(manifest_path, version='2.0')
+    assert local_parser.load_manifest(manifest_path, version='1.0')
+    assert 'Sync everything' in local_parser.format_help()
+    assert local_parser._handlers['sync'].options == ['-h', '--help', '--force']
+    assert 'lazy_commands' not in sys.modules
+    assert local_parser.handle(['sync']) == 17
+
+    # changed source invalidates the manifest
+    stat = lazy_module.stat()
+    os.utime(str(lazy_module), (stat.st_atime, stat.st_mtime + 10))
+    assert not Parser().load_manifest(manifest_path, version='1.0')
+
+
+def test_write_atomic(tmp_path):
+    from dephell_argparse._files import write_atomic
+
+    path = str(tmp_path / 'out.txt')
+
+    def write(number: int) -> None:
+        for _ in range(20):
+            write_atomic(path, str(number) * 1000)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(8)))
+    assert len(set(Path(path).read_text())) == 1
+
+    # a failed write keeps the old file and leaves nothing behind
+    with pytest.raises(UnicodeEncodeError):
+        write_atomic(path, '\udc80')
+    assert len(set(Path(path).read_text())) == 1
+    assert os.listdir(str(tmp_path)) == ['out.txt']
+
+
+def test_manifest_lost_state(lazy_module, tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    # the parser of the command is defined by the handler, so it's restored
+    from lazy_commands import SyncCommand
+    handler = SyncCommand(name='sync copy')
+    assert handler.description == 'Sync everything'
+    local_parser = Parser()
+    local_parser.add_command('lazy_commands:SyncCommand', name='sync all')
+    local_parser.add_command(handler)
+    local_parser.dump_manifest(manifest_path)
+    local_parser = Parser()
+    assert local_parser.load_manifest(manifest_path)
+    assert local_parser.handle(['sync', 'all', '--force']) == 17
+    assert local_parser.handle(['sync', 'copy']) == 17
+
+    sub = ArgumentParser()
+    sub.add_argument('name')
+    local_parser = Parser()
+    local_parser.add_command('lazy_commands:lazy_hello', name='greet', parser=sub)
+    assert local_parser.handle(['greet', 'bob']) == 18
+    with pytest.raises(ValueError, match='parser'):
+        local_parser.dump_manifest(manifest_path)
+    with pytest.raises(ValueError, match='parser'):
+        local_parser.freeze(str(tmp_path / 'frozen_greet.py'))
+
+    local_parser = Parser()
+    local_parser.add_command(SyncCommand(name='state', argv=['--force']))
+    with pytest.raises(ValueError, match='argv'):
+        local_parser.dump_manifest(manifest_path)
+
+
+def test_freeze(lazy_module, tmp_path, monkeypatch):
+    local_parser = Parser(prog='frozen')
+    assert not local_parser.load_frozen('frozen_commands')
+    local_parser.add_command('lazy_commands:SyncCommand')
+    local_parser.add_command('lazy_commands:lazy_hello', name='hello')
+    local_parser.freeze(str(tmp_path / 'frozen_commands.py'), version='1.0')
+    expected_help = local_parser.format_help()
+
+    monkeypatch.delitem(sys.modules, 'lazy_commands')
+    monkeypatch.delitem(sys.modules, 'frozen_commands', raising=False)
+    local_parser = Parser(prog='frozen')
+    assert not local_parser.load_frozen('frozen_commands', version='2.0')
+    assert local_parser.load_frozen('frozen_commands', version='1.0')
+    assert local_parser.format_help() == expected_help
+    assert local_parser._frozen_help is not None
+    assert 'lazy_commands' not in sys.modules
+
+    # the frozen help is shown even if help of a big registry is streamed
+    local_parser.stream_help_from = 1
+    local_parser.iter_help = local_parser._render_help = None
+    stream = StringIO()
+    assert local_parser.handle([], stderr=stream) == 0
+    assert stream.getvalue() == expected_help
+    del local_parser.iter_help, local_parser._render_help
+    assert local_parser.handle(['sync']) == 17
+
+    # help isn't used for other params
+    local_parser = Parser(prog='other')
+    assert local_parser.load_frozen('frozen_commands', version='1.0')
+    assert local_parser._frozen_help is None
+
+    # changed source invalidates the module
+    stat = lazy_module.stat()
+    os.utime(str(lazy_module), (stat.st_atime, stat.st_mtime + 10))
+    assert not Parser().load_frozen('frozen_commands', version='1.0')
+
+
+def test_debug_imports(lazy_module):
+    local_parser = Parser()
+    local_parser.add_command('lazy_commands:SyncCommand')
+    local_parser.add_command('lazy_commands:lazy_hello', name='hello')
+    local_parser.add_command(lambda args: 0, name='eager')
+
+    stream = StringIO()
+    assert local_parser.handle(['--debug-imports', 'hello'], stderr=stream) == 18
+    costs = local_parser.import_costs()
+    assert [cost.command for cost in costs] == ['hello']
+    assert costs[0].modules >= 1
+    assert 'lazy_commands:lazy_hello' in stream.getvalue()
+
+    stream = StringIO()
+    assert local_parser.handle(['--debug-imports'], stderr=stream) == 0
+    assert {cost.command for cost in local_parser.import_costs()} == {'hello', 'sync'}
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == 'imports: 2 lazy commands'
+    assert '1 commands are imported before registration' in lines[-1]
+
+
+@pytest.mark.parametrize('words, expected', [
+    ([''], ['math', 'ping']),
+    (['ma'], ['math']),
+    (['math', ''], ['prod', 'sum']),
+    (['math', 's'], ['sum']),
+    (['help', 'math', 'p'], ['prod']),
+    (['math', 'sum', '-'], ['--help', '-h']),
+    (['ping', '--h'], ['--help']),
+    (['junk', '-'], []),
+])
+def test_complete(words, expected):
+    assert parser.complete(words) == expected
+
+
+def test_complete_handle(capsys):
+    assert parser.handle(['__complete', 'math', '']) == 0
+    assert capsys.readouterr().out == 'prod\nsum\n'
+    assert parser.handle(['__completion', 'bash']) == 0
+    assert '__complete' in capsys.readouterr().out
+
+    stream = StringIO()
+    assert parser.handle(['__completion', 'tcsh'], stderr=stream) == 1
+    assert "unsupported shell: 'tcsh'" in stream.getvalue()
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('shell', ['bash', 'zsh', 'fish'])
+def test_completion_script(shell):
+    script = Parser(prog='my-app').get_completion_script(shell)
+    assert '__complete' in script
+    assert 'my-app' in script
+
+
+def test_observer():
+    class MathSumCommand(CommandHandler):
+        def __call__(self):
+            return sum(self.args.numbers)
+
+        @staticmethod
+        def build_parser(parser: Parser) -> Parser:
+            parser.add_argument('numbers', type=int, nargs='+')
+            return parser
+
+    profiles = []
+    local_parser = Parser(observer=profiles.append)
+    local_parser.add_command(MathSumCommand)
+    assert local_parser.handle(['math', 'sum', '10', '5']) == 15
+    assert local_parser.handle(['junk']) == 1
+
+    profile = profiles[0]
+    assert profile.command == 'math sum'
+    assert profile.code == 15
+    assert [phase.name for phase in profile.phases] == ['resolve', 'parser', 'parse_args', 'handler']
+    assert profile.wall >= sum(phase.wall for phase in profile.phases[1:])
+    assert profiles[1].command is None
+    assert profiles[1].code == 1
+
+
+@pytest.mark.parametrize('value, reporter', [
+    ('', type(None)),
+    ('0', type(None)),
+    ('1', TextReporter),
+    ('json', JSONReporter),
+])
+def test_observer_from_env(value, reporter, monkeypatch):
+    monkeypatch.setenv('DEPHELL_ARGPARSE_PROFILE', value)
+    assert type(Parser().observer) is reporter
+
+
+def test_json_reporter():
+    stream = StringIO()
+    local_parser = Parser(observer=JSONReporter(stream=stream))
+    local_parser.add_command(lambda args: 14, name='ping')
+    local_parser.handle(['ping'])
+    record = json.loads(stream.getvalue())
+    assert record['command'] == 'ping'
+    assert record['code'] == 14
+
+
+def test_handle_many():
+    calls = []
+
+    class EchoCommand(CommandHandler):
+        @staticmethod
+        def build_parser(parser: Parser) -> Parser:
+            calls.append(parser)
+            parser.add_argument('code', type=int)
+            return parser
+
+        def __call__(self):
+            return self.args.code
+
+    local_parser = Parser(stream=StringIO())
+    local_parser.add_command(EchoCommand)
+    argvs = [['echo', '0'], ['echo', '3'], ['junk'], ['echo', 'nan'], ['echo', '0']]
+    assert local_parser.handle_many(argvs) == [0, 3, 1, 2, 0]
+    assert len(calls) == 1
+    assert local_parser.handle_many(argvs, fail_fast=True) == [0, 3]
+
+
+def test_handle_batch(tmp_path):
+    path = tmp_path / 'commands.txt'
+    path.write_text('math sum 1 2\n\n["math", "prod", "2", "3"]\nping\n')
+    stream = StringIO()
+    local_parser = Parser(stream=stream)
+    for name, code in (('ping', 0), ('math sum', 4), ('math prod', 5)):
+        subparser = Parser()
+        subparser.add_argument('numbers', nargs='*')
+        local_parser.add_command(lambda args, code=code: code, name=name, parser=subparser)
+
+    assert local_parser.handle(['--batch', str(path)]) == 4
+    assert stream.getvalue() == '4\tmath sum 1 2\n5\t["math", "prod", "2", "3"]\n0\tping\n'
+
+    stream.seek(0)
+    stream.truncate()
+    assert local_parser.handle(['--batch', str(path), '--fail-fast']) == 4
+    assert stream.getvalue() == '4\tmath sum 1 2\n'
+
+    # malformed lines are reported, and the rest of lines are handled
+    path.write_text('ping\nmath "sum\n["math", \nping\n[1]\nping\n')
+    stream.seek(0)
+    stream.truncate()
+    assert local_parser.handle(['--batch', str(path)]) == 1
+    codes = [line.split('\t')[0] for line in stream.getvalue().splitlines() if '\t' in line]
+    assert codes == ['0', '1', '1', '0', '1', '0']
+    assert stream.getvalue().count('cannot parse line') == 3
+
+    stream.seek(0)
+    stream.truncate()
+    assert local_parser.handle(['--batch', str(path), '--fail-fast']) == 1
+    assert stream.getvalue().endswith('1\tmath "sum\n')
+
+
+def test_handle_batch_exit_message(tmp_path, capsys):
+    path = tmp_path / 'commands.txt'
+    path.write_text('quit\n')
+    local_parser = Parser()
+    local_parser.add_command(lambda args: exit('bye'), name='quit')
+
+    stderr = StringIO()
+    assert local_parser.handle(['--batch', str(path)], stderr=stderr) == 1
+    assert stderr.getvalue() == 'bye\n1\tquit\n'
+
+    stream = StringIO()
+    local_parser.stream = stream
+    assert local_parser.handle_many([['quit']]) == [1]
+    assert stream.getvalue() == 'bye\n'
+    assert capsys.readouterr().err == ''
+
+
+@pytest.fixture
+def loop():
+    # asyncio.run is available only since Python 3.7
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_async_handlers(loop):
+    async def sleep_command(args) -> int:
+        await asyncio.sleep(0)
+        return 6
+
+    class AwaitCommand(CommandHandler):
+        async def __call__(self):
+            await asyncio.sleep(0)
+            return True
+
+    local_parser = Parser()
+    local_parser.add_command(sleep_command)
+    local_parser.add_command(AwaitCommand)
+    local_parser.add_command(lambda args: 7, name='sync')
+    assert local_parser.handle(['sleep']) == 6
+    assert local_parser.handle(['await']) == 0
+    assert loop.run_until_complete(local_parser.handle_async(['sleep'])) == 6
+    assert loop.run_until_complete(local_parser.handle_async(['sync'])) == 7
+
+
+def test_handle_many_async(loop):
+    running = []
+    peak = []
+
+    async def wait_command(args) -> int:
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(.01)
+        running.pop()
+        return 3
+
+    local_parser = Parser()
+    local_parser.add_command(wait_command)
+    codes = loop.run_until_complete(local_parser.handle_many_async([['wait']] * 10, limit=4))
+    assert codes == [3] * 10
+    assert max(peak) == 4
+
+
+def make_parallel_parser() -> Parser:
+    class SquareCommand(CommandHandler):
+        @staticmethod
+        def build_parser(parser: Parser) -> Parser:
+            parser.add_argument('number', type=int)
+            return parser
+
+        def __call__(self):
+            self.print(self.args.number ** 2)
+            print('pid', os.getpid(), file=sys.stderr)
+            return self.args.number % 3
+
+    local_parser = Parser()
+    local_parser.add_command(SquareCommand)
+    return local_parser
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is required')
+def test_handle_parallel():
+    stdout = StringIO()
+    stderr = StringIO()
+    local_parser = make_parallel_parser()
+    argvs = [['square', str(n)] for n in range(20)] + [['junk']]
+    codes = local_parser.handle_parallel(argvs, workers=4, stdout=stdout, stderr=stderr)
+    assert codes == [n % 3 for n in range(20)] + [1]
+    assert stdout.getvalue().split() == [str(n ** 2) for n in range(20)]
+    assert stderr.getvalue().count('pid') == 20
+    assert 'command not found' in stderr.getvalue()
+    assert str(os.getpid()) not in stderr.getvalue()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is required')
+def test_handle_parallel_threads():
+    subparser = ArgumentParser()
+    subparser.add_argument('number', type=int)
+    other_parser = Parser()
+    other_parser.add_command(lambda args: args.number + 7, name='square', parser=subparser)
+
+    def run(local_parser: Parser):
+        argvs = [['square', str(n)] for n in range(10)]
+        return local_parser.handle_parallel(argvs, workers=2, stdout=StringIO(), stderr=StringIO())
+
+    # every call uses its own parser even if called at once
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(run, [make_parallel_parser(), other_parser] * 2))
+    assert results[0] == results[2] == [n % 3 for n in range(10)]
+    assert results[1] == results[3] == [n + 7 for n in range(10)]
+
+
+def test_handle_parallel_factory():
+    stdout = StringIO()
+    codes = Parser().handle_parallel(
+        [['square', '3'], ['square', '4']],
+        workers=2,
+        factory=make_parallel_parser,
+        stdout=stdout,
+        stderr=StringIO(),
+    )
+    assert codes == [0, 1]
+    assert stdout.getvalue() == '9\n16\n'
+
+
+def test_threads_isolated():
+    class EchoCommand(CommandHandler):
+        @staticmethod
+        def build_parser(parser: Parser) -> Parser:
+            parser.add_argument('word')
+            return parser
+
+        def __call__(self):
+            for _ in range(5):
+                self.print(self.args.word)
+            return int(self.args.word) % 7
+
+    local_parser = Parser()
+    local_parser.add_command(EchoCommand)
+    # the prototype has cached args that must not leak into calls
+    local_parser._resolve_handler('echo').copy(argv=['-1']).args
+
+    def worker(number: int) -> bool:
+        for index in range(50):
+            word = str(number * 1000 + index)
+            stdout = StringIO()
+            code = local_parser.handle(['echo', word], stdout=stdout)
+            if code != int(word) % 7 or stdout.getvalue() != (word + '\n') * 5:
+                return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        assert all(executor.map(worker, range(32)))
+
+
+def test_copy_per_call_state():
+    handler = CommandHandler(handler=lambda args: args, argv=[])
+    handler.args
+    handler.profile = object()
+    copied = handler.copy(argv=[])
+    assert 'args' not in vars(copied)
+    assert copied.profile is None
+
+
+def test_parsers_cache():
+    calls = []
+
+    def make_command(name: str):
+        class Command(CommandHandler):
+            @staticmethod
+            def build_parser(parser: Parser) -> Parser:
+                calls.append(name)
+                return parser
+
+            def __call__(self):
+                return self.args and 0
+        return Command
+
+    local_parser = Parser(parsers_cache_size=2)
+    for name in ('first', 'second', 'third'):
+        local_parser.add_command(make_command(name), name=name)
+
+    for _ in range(3):
+        assert local_parser.handle(['first']) == 0
+    assert calls == ['first']
+    assert local_parser.parsers_cache_info() == (2, 1, 2, 1)
+
+    local_parser.handle(['second'])
+    local_parser.handle(['third'])
+    local_parser.handle(['first'])
+    assert calls == ['first', 'second', 'third', 'first']
+    assert local_parser.parsers_cache_info().currsize == 2
+
+    # re-registration drops the cached parser
+    local_parser.add_command(make_command('third'), name='third')
+    local_parser.handle(['third'])
+    assert calls[-1] == 'third'
+    assert len(calls) == 5
+
+
+def test_compact_records():
+    class CustomCommand(CommandHandler):
+        name = 'my custom'
+
+    def hello_world(args):
+        return 0
+
+    local_parser = Parser()
+    local_parser.add_command(CustomCommand)
+    local_parser.add_command(hello_world)
+    local_parser.add_command(CommandHandler(handler=hello_world, name='instance'))
+    assert set(local_parser._handlers) == {'my custom', 'hello world', 'instance'}
+    assert not hasattr(local_parser._handlers['my custom'], '__dict__')
+    assert not hasattr(local_parser._handlers['hello world'], '__dict__')
+    assert isinstance(local_parser._handlers['instance'], CommandHandler)
+    assert local_parser.handle(['hello', 'world']) == 0
+    assert isinstance(local_parser._resolve_handler('my custom'), CustomCommand)
+
+
+def test_help_cache():
+    local_parser = Parser()
+    local_parser.add_command(lambda args: 0, name='math sum')
+    first = local_parser.format_help()
+    assert local_parser.format_help() is first
+    assert local_parser._helps.info().hits == 1
+
+    command = local_parser._make_command(['math'])
+    group_help = local_parser.format_help(command=command)
+    assert group_help is not first
+    assert local_parser.format_help(command=local_parser._make_command(['math'])) is group_help
+
+    local_parser.width = 60
+    assert local_parser.format_help() is not first
+
+    local_parser.add_command(lambda args: 0, name='math prod')
+    assert 'math prod' in local_parser.format_help()
+
+
+def make_groups_parser(**kwargs) -> Parser:
+    local_parser = Parser(prog='groups', description='Many commands', epilog='the end', **kwargs)
+    for group in ('math', 'text'):
+        for name in ('one', 'two', 'three'):
+            local_parser.add_command(lambda args: 0, name=group + ' ' + name, summary='do ' + name)
+    return local_parser
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['math'],
+    ['maht', 'onee'],
+])
+def test_iter_help(argv):
+    local_parser = make_groups_parser()
+    command = local_parser._make_command(argv) if argv else None
+    chunks = list(local_parser.iter_help(command=command))
+    assert len(chunks) > 3
+    assert ''.join(chunks) == local_parser._render_help(command=command)
+
+
+def test_iter_help_per_group():
+    local_parser = make_groups_parser()
+    text = ''.join(local_parser.iter_help(per_group=1))
+    assert 'math one' in text
+    assert 'text one' in text
+    assert 'math two' not in text
+    assert text.count('... and 2 more') == 2
+
+
+def test_handle_streams_help():
+    local_parser = make_groups_parser(help_per_group=2)
+    stream = StringIO()
+    code = local_parser.handle([], stderr=stream)
+    assert code == 0
+    assert 'math two' in stream.getvalue()
+    assert 'math three' not in stream.getvalue()
+    assert '... and 1 more' in stream.getvalue()
+
+
+def test_write_help_pager(capfd):
+    class TTY(StringIO):
+        def isatty(self):
+            return True
+
+    local_parser = make_groups_parser()
+    stream = TTY()
+    local_parser.write_help(stream=stream, pager='cat')
+    assert stream.getvalue() == ''
+    assert 'math three' in capfd.readouterr().out
+
+    local_parser.write_help(stream=StringIO(), pager='cat')
+    assert capfd.readouterr().out == ''
+
+
+def test_handle_flushes_output():
+    local_parser = Parser()
+
+    @local_parser.add_command
+    class RowsCommand(CommandHandler):
+        def __call__(self):
+            self.write_lines(str(i) for i in range(3))
+            return True
+
+    stream = StringIO()
+    assert local_parser.handle(['rows'], stdout=stream) == 0
+    assert stream.getvalue() == '0\n1\n2\n'
+
+
+def make_records_parser() -> Parser:
+    local_parser = Parser()
+
+    @local_parser.add_command
+    class UsersCommand(CommandHandler):
+        def __call__(self):
+            for index in range(3):
+                yield dict(id=index, name='user {}'.format(index))
+
+    @local_parser.add_command
+    class PointsCommand(CommandHandler):
+        def __call__(self):
+            Point = namedtuple('Point', ['x', 'y'])
+            return [Point(1, 2), Point(3, 4)]
+
+    @local_parser.add_command
+    class PairCommand(CommandHandler):
+        def __call__(self):
+            return ('a,b', 1)
+
+    return local_parser
+
+
+@pytest.mark.parametrize('argv, expected', [
+    (['users'], '{"id": 0, "name": "user 0"}\n{"id": 1, "name": "user 1"}\n{"id": 2, "name": "user 2"}\n'),
+    (['--format', 'csv', 'users'], 'id,name\n0,user 0\n1,user 1\n2,user 2\n'),
+    (['--format=tsv', 'points'], 'x\ty\n1\t2\n3\t4\n'),
+    (['--format', 'jsonl', 'points'], '{"x": 1, "y": 2}\n{"x": 3, "y": 4}\n'),
+    (['--format', 'csv', 'pair'], '"a,b",1\n'),
+])
+def test_records(argv, expected):
+    stream = StringIO()
+    assert make_records_parser().handle(argv, stdout=stream) == 0
+    assert stream.getvalue() == expected
+
+
+def test_records_unknown_format():
+    stream = StringIO()
+    assert make_records_parser().handle(['--format', 'xml', 'users'], stderr=stream) == 1
+    assert 'unknown format' in stream.getvalue()
+
+
+def test_records_only_of_records():
+    local_parser = Parser()
+    local_parser.add_command(lambda args: ['a', 'b'], name='strings')
+    local_parser.add_command(lambda args: iter([1, 2]), name='numbers')
+    local_parser.add_command(lambda args: iter([]), name='nothing')
+
+    stream = StringIO()
+    # not records, returned as is like before
+    assert local_parser.handle(['strings'], stdout=stream) == ['a', 'b']
+    assert local_parser.handle(['nothing'], stdout=stream) == 0
+    assert stream.getvalue() == ''
+    with pytest.raises(TypeError, match='iterator of int instead of records'):
+        local_parser.handle(['numbers'], stdout=stream)
+
+
+def test_records_dataclass():
+    dataclasses = pytest.importorskip('dataclasses')
+    user_type = dataclasses.make_dataclass('User', ['id', 'name'])
+    local_parser = Parser()
+    local_parser.add_command(lambda args: user_type(1, 'one'), name='user')
+
+    stream = StringIO()
+    assert local_parser.handle(['--format', 'csv', 'user'], stdout=stream) == 0
+    assert stream.getvalue() == 'id,name\n1,one\n'
+
+
+def add_distribution(root, name: str, entry_points: str) -> None:
+    dist_info = root / (name + '-1.0.dist-info')
+    dist_info.mkdir()
+    (dist_info / 'METADATA').write_text('Metadata-Version: 2.1\nName: {}\nVersion: 1.0\n'.format(name))
+    (dist_info / 'entry_points.txt').write_text(entry_points)
+
+
+def test_load_plugins(lazy_module, tmp_path, monkeypatch):
+    import dephell_argparse._plugins as plugins
+
+    add_distribution(tmp_path, 'sync_plugin', (
+        '[dephell_argparse_test]\n'
+        'sync = lazy_commands:SyncCommand\n'
+        'say hello = lazy_commands:lazy_hello [extra]\n'
+    ))
+    # the cache directory is created before to not change the fingerprint
+    (tmp_path / 'cache').mkdir()
+    cache_path = str(tmp_path / 'cache' / 'plugins.json')
+    local_parser = Parser()
+    names = local_parser.load_plugins(group='dephell_argparse_test', cache_path=cache_path)
+    assert names == ['sync', 'say hello']
+    assert 'lazy_commands' not in sys.modules
+
+    # the cache is used while nothing is installed
+    def discover(group):
+        raise AssertionError('must not be called')
+
+    monkeypatch.setattr(plugins, 'discover', discover)
+    assert Parser().load_plugins(group='dephell_argparse_test', cache_path=cache_path) == names
+    assert local_parser.handle(['say', 'hello']) == 18
+
+    # a new distribution invalidates the cache
+    monkeypatch.undo()
+    monkeypatch.syspath_prepend(str(tmp_path))
+    add_distribution(tmp_path, 'other_plugin', '[dephell_argparse_test]\nother = lazy_commands:lazy_hello\n')
+    names = Parser().load_plugins(group='dephell_argparse_test', cache_path=cache_path)
+    assert sorted(names) == ['other', 'say hello', 'sync']
+
+
+def test_plugins_fingerprint(tmp_path, monkeypatch):
+    from dephell_argparse._plugins import get_fingerprint
+
+    monkeypatch.chdir(str(tmp_path))
+    # the current directory for `python -m` and the script directory for scripts
+    monkeypatch.setattr(sys, 'path', ['', str(tmp_path)] + sys.path)
+    fingerprint = get_fingerprint()
+    # files in directories without distributions don't invalidate the cache
+    (tmp_path / 'notes.txt').write_text('hello')
+    assert get_fingerprint() == fingerprint
+    assert '' not in dict(fingerprint)
+    assert str(tmp_path) not in dict(fingerprint)
+
+    # but a new distribution does
+    add_distribution(tmp_path, 'new_plugin', '')
+    assert str(tmp_path) in dict(get_fingerprint())
+
+
+def test_metrics(tmp_path):
+    import tracemalloc
+
+    metrics = Metrics(trace_memory=True)
+    try:
+        local_parser = Parser(metrics=metrics)
+
+        @local_parser.add_command
+        class AllocCommand(CommandHandler):
+            def __call__(self):
+                data = [object() for _ in range(10000)]
+                return len(data) and self.argv == ('fail', )
+
+        assert local_parser.handle(['alloc']) == 2
+        assert local_parser.handle(['alloc', 'fail']) == 0
+        assert local_parser.handle(['--help']) == 0
+    finally:
+        tracemalloc.stop()
+
+    snapshot = metrics.snapshot()
+    assert list(snapshot) == ['alloc']
+    stats = snapshot['alloc']
+    assert stats['calls'] == 2
+    assert stats['codes'] == {'0': 1, '2': 1}
+    assert stats['wall'] > 0
+    assert stats['user'] + stats['sys'] >= 0
+    assert stats['memory_max'] > 10000 * 16
+
+    text = metrics.as_prometheus()
+    assert 'dephell_argparse_command_calls_total{command="alloc",code="2"} 1\n' in text
+    assert '# TYPE dephell_argparse_command_wall_seconds_total counter\n' in text
+
+    path = tmp_path / 'metrics.json'
+    metrics.dump(str(path), kind='json')
+    assert json.loads(path.read_text())['alloc']['calls'] == 2
+
+
+def test_big_help_cache():
+    local_parser = make_groups_parser()
+    local_parser.stream_help_from = 3
+    command = local_parser._make_command(['one'])
+    assert command.guesses
+
+    for _ in range(2):
+        stream = StringIO()
+        assert local_parser.handle(['one'], stderr=stream) == 1
+        assert 'math one' in stream.getvalue()
+    assert local_parser._helps.info().hits == 1
+
+    # the full list is streamed and not cached
+    stream = StringIO()
+    assert local_parser.handle([], stderr=stream) == 0
+    assert 'text three' in stream.getvalue()
+    assert local_parser._helps.info().currsize == 1
@@ -0,0 +1,122 @@
+# built-in
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# external
+import pytest
+
+# project
+from dephell_argparse._client import call_server
+
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'fork'),
+    reason='UNIX sockets and fork are required',
+)
+
+
+SERVER = """
+import os
+from dephell_argparse import CommandHandler, Metrics, Parser
+
+
+class DumpedMetrics(Metrics):
+    def add(self, profile):
+        super().add(profile)
+        self.dump({metrics_path!r}, kind='json')
+
+
+class EchoCommand(CommandHandler):
+    @staticmethod
+    def build_parser(parser):
+        parser.add_argument('words', nargs='*')
+        return parser
+
+    def __call__(self):
+        self.print(*self.args.words)
+        self.print(os.getcwd(), os.environ.get('TEST_SERVER_VAR'))
+        return 13
+
+
+def nothing(args):
+    pass
+
+
+parser = Parser(metrics=DumpedMetrics())
+parser.add_command(EchoCommand)
+parser.add_command(nothing)
+parser.serve({path!r})
+"""
+
+
+@pytest.fixture
+def server_path(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+    source = SERVER.format(path=path, metrics_path=str(tmp_path / 'metrics.json'))
+    process = subprocess.Popen([sys.executable, '-c', source], env=env)
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(.05)
+    yield path
+    process.terminate()
+    process.wait()
+
+
+def test_call_server(server_path, tmp_path, capfd, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    monkeypatch.setenv('TEST_SERVER_VAR', 'twilight')
+    assert call_server(server_path, ['echo', 'hello', 'world']) == 13
+    output = capfd.readouterr().out.splitlines()
+    assert output == ['hello world', '{} twilight'.format(tmp_path)]
+
+    assert call_server(server_path, ['unknown']) == 1
+    assert 'command not found' in capfd.readouterr().err
+    assert call_server(server_path, ['echo', '--junk']) == 2
+
+
+def test_call_server_none(server_path, capfd):
+    assert call_server(server_path, ['nothing']) == 0
+    assert 'Traceback' not in capfd.readouterr().err
+
+
+def test_call_server_metrics(server_path, tmp_path):
+    metrics_path = tmp_path / 'metrics.json'
+    assert call_server(server_path, ['echo', 'hello']) == 13
+    assert call_server(server_path, ['nothing']) == 0
+    assert call_server(server_path, ['echo']) == 13
+    # metrics are sent by children and aggregated by the server
+    stats = dict()
+    for _ in range(100):
+        if metrics_path.exists():
+            stats = json.loads(metrics_path.read_text())
+            if stats.get('echo', {}).get('calls') == 2 and 'nothing' in stats:
+                break
+        time.sleep(.05)
+    assert stats['echo']['codes'] == {'13': 2}
+    assert stats['nothing']['codes'] == {'0': 1}
+
+
+def test_serve_restores_sigchld(tmp_path):
+    source = (
+        'import signal, subprocess, sys\n'
+        'from dephell_argparse import Parser\n'
+        'def stop(*args):\n'
+        '    raise KeyboardInterrupt\n'
+        'signal.signal(signal.SIGALRM, stop)\n'
+        'signal.setitimer(signal.ITIMER_REAL, .2)\n'
+        'try:\n'
+        '    Parser().serve({path!r})\n'
+        'except KeyboardInterrupt:\n'
+        '    pass\n'
+        'assert signal.getsignal(signal.SIGCHLD) == signal.SIG_DFL\n'
+        'sys.exit(subprocess.call([sys.executable, "-c", "exit(3)"]))\n'
+    ).format(path=str(tmp_path / 'server.sock'))
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+    assert subprocess.call([sys.executable, '-c', source], env=env) == 3